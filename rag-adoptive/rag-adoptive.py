@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 import argparse
 import sys
+from typing import Iterable, List
 
 from chat_completion import ingest_documents
+from src.compression import compression_stats
+from src.config import load_settings
+from src.response_cache import response_cache_stats
+from src.query_cache import query_cache_stats
+from src.vector_store import get_vector_store
 from src.rag_pipeline import build_pipeline
 
 
+def print_stream(pieces: Iterable[str]) -> None:
+    """Print answer text as it arrives."""
+    for piece in pieces:
+        print(piece, end="", flush=True)
+    print()
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Adaptive RAG demo with router (direct | rag | agent)."
+        description="Adaptive RAG demo with router (direct | rag | agent).",
+        epilog="Run `rag-adoptive.py reindex --help` to rebuild the vector index.",
     )
     parser.add_argument(
         "question",
@@ -21,21 +35,55 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Skip re-ingesting local documents (assumes already in DB).",
     )
+    parser.add_argument(
+        "--full-ingest",
+        action="store_true",
+        help="Re-embed every chunk, even ones whose content hash is unchanged.",
+    )
     parser.add_argument(
         "--top-k",
         type=int,
         default=3,
-        help="Number of documents to retrieve from pgvector for RAG paths.",
+        help="Maximum number of documents to retrieve from pgvector for RAG paths.",
     )
     return parser.parse_args()
 
 
+def parse_reindex_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="rag-adoptive.py reindex",
+        description="Rebuild the vector index for this project's documents table.",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=["hnsw", "ivfflat"],
+        default=None,
+        help="Index to build (defaults to the configured index_type).",
+    )
+    return parser.parse_args(argv)
+
+
+def reindex(argv: List[str]) -> int:
+    args = parse_reindex_args(argv)
+    settings = load_settings()
+    if args.index_type:
+        settings.index_type = args.index_type
+    store = get_vector_store(settings)
+    print(f"Rebuilding {settings.vector_backend} index on {settings.table_name}...")
+    print(f"Built: {store.build_index(force=True)}")
+    store.check_index()
+    return 0
+
+
 def main() -> int:
+    if sys.argv[1:2] == ["reindex"]:
+        return reindex(sys.argv[2:])
     args = parse_args()
     pipeline = build_pipeline()
     if not args.skip_ingest:
         print("Ingesting travel guideline documents...")
-        pipeline.ingest()
+        stats = pipeline.ingest(full=args.full_ingest)
+        print(f"Ingest complete: {stats}")
 
     question = args.question or input("Enter your question: ").strip()
     if not question:
@@ -43,17 +91,22 @@ def main() -> int:
         return 1
 
     print(f"Asking: {question}")
-    answer = pipeline.answer(question, k=args.top_k)
     print("\nAnswer:\n")
-    print(answer)
+    print_stream(pipeline.answer_stream(question, k=args.top_k))
 
     print("\nInteractive chat (blank line or 'exit' to quit):")
     while True:
         user_q = input("You: ").strip()
         if not user_q or user_q.lower() in {"exit", "quit"}:
             break
-        reply = pipeline.answer(user_q, k=args.top_k)
-        print(f"\nAssistant:\n{reply}\n")
+        print("\nAssistant:")
+        print_stream(pipeline.answer_stream(user_q, k=args.top_k))
+        print()
+    print(f"Query cache: {query_cache_stats()}")
+    print(f"Response cache: {response_cache_stats()}")
+    compression = compression_stats()
+    if compression.chunks:
+        print(f"Context compression: {compression}")
     return 0
 
 
@@ -1,8 +1,8 @@
 from typing import List, Literal, Tuple
 
-from openai import OpenAI
-
+from src.clients import get_openai_client
 from src.config import Settings
+from src.response_cache import chat_completion
 
 GateDecision = Literal["correct", "ambiguous", "incorrect"]
 
@@ -14,7 +14,6 @@ def grade_documents(settings: Settings, question: str, contexts: List[str]) -> G
     if not contexts:
         return "incorrect"
 
-    client = OpenAI(api_key=settings.openai_api_key)
     prompt = (
         "You are evaluating retrieved travel context for a question.\n"
         "Label as one of: Correct, Ambiguous, Incorrect.\n"
@@ -25,7 +24,10 @@ def grade_documents(settings: Settings, question: str, contexts: List[str]) -> G
         f"Contexts:\n{format_contexts(contexts)}\n\n"
         "Answer with only one word: Correct, Ambiguous, or Incorrect."
     )
-    response = client.chat.completions.create(
+    content = chat_completion(
+        settings,
+        get_openai_client(settings),
+        "grade",
         model=settings.grader_model,
         temperature=0,
         messages=[
@@ -33,7 +35,7 @@ def grade_documents(settings: Settings, question: str, contexts: List[str]) -> G
             {"role": "user", "content": prompt},
         ],
     )
-    label = (response.choices[0].message.content or "").strip().lower()
+    label = content.strip().lower()
     if "correct" in label:
         return "correct"
     if "ambiguous" in label:
@@ -1,15 +1,66 @@
-from typing import List
-
-from openai import OpenAI
+from typing import Iterable, Iterator, List, Sequence
 
 from src.config import Settings
+from src.embedding_cache import get_embedding_cache
+from src.embedding_scheduler import get_scheduler
+from src.tokens import estimate_tokens
 
 
 def embed_text(settings: Settings, text: str) -> List[float]:
     """Return an embedding vector for the given text."""
-    client = OpenAI(api_key=settings.openai_api_key)
-    response = client.embeddings.create(
-        input=text,
-        model=settings.embed_model,
+    return embed_texts(settings, [text])[0]
+
+
+def embed_texts(
+    settings: Settings, texts: Sequence[str], use_cache: bool = True
+) -> List[List[float]]:
+    """
+    Return embedding vectors for many texts, in input order.
+    Texts already in the on-disk cache are served locally (unless use_cache=False);
+    the rest are packed into as few embeddings requests as the item/token limits
+    allow, sent concurrently within the configured rate limits.
+    """
+    if not texts:
+        return []
+    cache = get_embedding_cache(settings) if use_cache else None
+    if cache is None:
+        return _request_embeddings(settings, texts)
+
+    embeddings = cache.get_many(texts)
+    missing = list(dict.fromkeys(text for text, vec in zip(texts, embeddings) if vec is None))
+    if missing:
+        fresh = _request_embeddings(settings, missing)
+        cache.put_many(missing, fresh)
+        by_text = dict(zip(missing, fresh))
+        embeddings = [vec if vec is not None else by_text[text] for text, vec in zip(texts, embeddings)]
+    return embeddings
+
+
+def _request_embeddings(settings: Settings, texts: Sequence[str]) -> List[List[float]]:
+    batches = list(
+        batch_texts(
+            texts,
+            max_items=settings.embed_batch_size,
+            max_tokens=settings.embed_batch_tokens,
+        )
     )
-    return response.data[0].embedding
+    results = get_scheduler(settings).run(batches)
+    return [embedding for batch in results for embedding in batch]
+
+
+def batch_texts(
+    texts: Iterable[str], max_items: int, max_tokens: int
+) -> Iterator[List[str]]:
+    """Group texts into request-sized batches bounded by item count and estimated tokens."""
+    batch: List[str] = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
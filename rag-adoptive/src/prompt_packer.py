@@ -0,0 +1,94 @@
+"""
+Token-budgeted prompt packing.
+
+Every chat call sends a system prompt, some conversation history, retrieved
+(internal) contexts, external tool output and the question. pack_prompt() fits them
+into `prompt_token_budget` so prompt size, and with it latency and cost, stays
+predictable. The system prompt and question are always kept; everything else is
+admitted in priority order while it fits:
+
+    1. the best internal context
+    2. external contexts (live data such as weather)
+    3. the most recent conversation turn
+    4. the remaining internal contexts, best first
+    5. older conversation turns, newest first
+
+A context that does not fit whole is cut to the space left when at least
+`prompt_min_context_tokens` remain; otherwise it is dropped. Turns are kept or
+dropped whole, and once one is dropped so are all older ones. The packed lists
+keep their original order.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from src.config import Settings
+from src.tokens import count_tokens, truncate_tokens
+
+# Allowances for text the pipelines add around the packed parts.
+PROMPT_OVERHEAD = 40  # prompt template, route/instructions line, message framing
+CONTEXT_OVERHEAD = 8  # "Context N (source):" label and separators
+MESSAGE_OVERHEAD = 4  # per chat message
+
+
+@dataclass
+class PackedPrompt:
+    history: List[dict] = field(default_factory=list)
+    internal: List[str] = field(default_factory=list)
+    external: List[str] = field(default_factory=list)
+    tokens: int = 0  # counted tokens of everything packed, including overheads
+    truncated: int = 0  # contexts cut short
+    dropped: int = 0  # contexts and turns left out
+
+
+def pack_prompt(
+    settings: Settings,
+    system: str,
+    question: str,
+    history: Sequence[dict] = (),
+    internal: Sequence[str] = (),
+    external: Sequence[str] = (),
+) -> PackedPrompt:
+    """Select and trim history and contexts to fit settings.prompt_token_budget."""
+    model = settings.chat_model
+    used = PROMPT_OVERHEAD + count_tokens(system, model) + count_tokens(question, model)
+    remaining = settings.prompt_token_budget - used
+
+    turns = [list(history[pos : pos + 2]) for pos in range(0, len(history), 2)]
+    order: List[Tuple[str, int]] = [("internal", 0)] if internal else []
+    order += [("external", pos) for pos in range(len(external))]
+    order += [("history", len(turns) - 1)] if turns else []
+    order += [("internal", pos) for pos in range(1, len(internal))]
+    order += [("history", pos) for pos in reversed(range(len(turns) - 1))]
+
+    kept: Dict[str, Dict[int, Any]] = {"internal": {}, "external": {}, "history": {}}
+    packed = PackedPrompt()
+    history_closed = False
+    for kind, pos in order:
+        if kind == "history":
+            cost = sum(count_tokens(msg["content"] or "", model) + MESSAGE_OVERHEAD for msg in turns[pos])
+            if history_closed or cost > remaining:
+                history_closed = True
+                packed.dropped += 1
+                continue
+            kept[kind][pos] = turns[pos]
+        else:
+            text = (internal if kind == "internal" else external)[pos]
+            cost = count_tokens(text, model) + CONTEXT_OVERHEAD
+            if cost > remaining:
+                room = remaining - CONTEXT_OVERHEAD
+                if room < settings.prompt_min_context_tokens:
+                    packed.dropped += 1
+                    continue
+                text = truncate_tokens(text, room, model)
+                cost = count_tokens(text, model) + CONTEXT_OVERHEAD
+                packed.truncated += 1
+            kept[kind][pos] = text
+        remaining -= cost
+        used += cost
+
+    packed.internal = [kept["internal"][pos] for pos in sorted(kept["internal"])]
+    packed.external = [kept["external"][pos] for pos in sorted(kept["external"])]
+    packed.history = [msg for pos in sorted(kept["history"]) for msg in kept["history"][pos]]
+    packed.tokens = used
+    return packed
@@ -1,50 +1,128 @@
 from textwrap import dedent
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
-
-from src import db
+from src.answer_cache import get_answer_cache
+from src.clients import get_openai_client
+from src.compression import context_texts
 from src.config import Settings, load_settings
 from src.conversation import ConversationHistory
-from src.data_loader import load_documents
-from src.embeddings import embed_text
-from src.external_search import external_search
+from src.external_search import external_search, has_live_data
+from src.filters import SearchFilter
+from src.ingest import IngestStats, ingest_corpus
+from src.prompt_packer import PackedPrompt, pack_prompt
+from src.query_cache import embed_queries, embed_query
+from src.response_cache import chat_completion, stream_chat_completion
+from src.retrieval import RetrievedChunk, candidate_pool, select_chunks
+from src.tool_memo import tool_memo_scope
+from src.vector_store import get_vector_store
+
+SYSTEM_PROMPT = (
+    "You are a travel assistant. ALWAYS ground your answer in provided context blocks. "
+    "Treat External API context as current information. If context is insufficient, say so."
+)
+DIRECT_SYSTEM_PROMPT = "You are a concise travel assistant. Answer briefly without retrieval."
 
 
 class RAGPipeline:
     def __init__(self, settings: Settings, history: Optional[ConversationHistory] = None):
         self.settings = settings
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.store = get_vector_store(settings)
+        self.answers = get_answer_cache(settings)
+        self.client = get_openai_client(settings)
         self.history = history or ConversationHistory(max_turns=settings.history_size)
 
-    def ingest(self) -> None:
-        documents = load_documents(
-            self.settings.data_dir,
-            chunk_size=self.settings.chunk_size,
-            overlap=self.settings.chunk_overlap,
+    def close(self) -> None:
+        """Release what this pipeline holds; the shared database pool stays open for other users."""
+        self.store.close()
+
+    def ingest(self, full: bool = False) -> IngestStats:
+        stats = ingest_corpus(self.settings, full=full, store=self.store)
+        if self.answers is not None and (stats.embedded or stats.deleted):
+            self.answers.invalidate()  # cached answers were grounded in the old corpus
+        return stats
+
+    def retrieve(
+        self,
+        question: str,
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[RetrievedChunk]:
+        _, chunks = self._search(question, k, probes=probes, ef_search=ef_search, filters=filters)
+        return chunks
+
+    def retrieve_many(
+        self,
+        questions: Sequence[str],
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        retrieve() for a batch of questions: one embeddings request for the uncached
+        questions and one store query, returning up to k chunks per question.
+        """
+        embeddings = embed_queries(self.settings, questions)
+        pool = candidate_pool(self.settings, k)
+        results = self.store.fetch_similar_many(
+            embeddings,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_texts=questions,
+            filters=filters,
+            with_embeddings=pool > k,
+        )
+        return [
+            select_chunks(self.settings, embedding, rows, k) for embedding, rows in zip(embeddings, results)
+        ]
+
+    def _search(
+        self,
+        question: str,
+        k: int,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> Tuple[List[float], List[RetrievedChunk]]:
+        """Query embedding plus the selected chunks for the question."""
+        query_embedding = embed_query(self.settings, question)
+        pool = candidate_pool(self.settings, k)
+        rows = self.store.fetch_similar(
+            query_embedding,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_text=question,
+            filters=filters,
+            with_embeddings=pool > k,
         )
-        db.ensure_schema(self.settings)
-        payload = []
-        for title, content in documents:
-            embedding = embed_text(self.settings, content)
-            payload.append((title, content, embedding))
-        db.upsert_documents(self.settings, payload)
-
-    def retrieve(self, question: str, k: int = 3) -> List[str]:
-        query_embedding = embed_text(self.settings, question)
-        rows = db.fetch_similar(self.settings, query_embedding, limit=k)
-        return [content for _, content, _ in rows]
+        chunks = select_chunks(self.settings, query_embedding, rows, k)
+        return query_embedding, chunks
 
     def answer(self, question: str, k: int = 3) -> str:
-        route = self._classify(question)
-        if route == "direct":
-            answer = self._direct_answer(question)
-        elif route == "agent":
-            answer = self._agent_answer(question, k=k)
-        else:
-            answer = self._rag_answer(question, k=k)
-        self.history.add_turn(question, answer)
-        return answer
+        return "".join(self.answer_stream(question, k=k))
+
+    def answer_stream(self, question: str, k: int = 3) -> Iterator[str]:
+        """
+        answer() as it is generated: yields text pieces (a cached answer arrives
+        whole). The full answer is added to the history once the stream ends.
+        """
+        with tool_memo_scope():  # tool lookups run while the route prepares its prompt
+            route = self._classify(question)
+            if route == "direct":
+                pieces = self._direct_answer(question)
+            elif route == "agent":
+                pieces = self._agent_answer(question, k=k)
+            else:
+                pieces = self._rag_answer(question, k=k)
+        parts: List[str] = []
+        for piece in pieces:
+            parts.append(piece)
+            yield piece
+        self.history.add_turn(question, "".join(parts))
 
     def _classify(self, question: str) -> str:
         """
@@ -67,12 +145,14 @@ class RAGPipeline:
             """
         ).strip()
         try:
-            resp = self.client.chat.completions.create(
+            label = chat_completion(
+                self.settings,
+                self.client,
+                "route",
                 model=self.settings.chat_model,
                 temperature=0,
                 messages=[{"role": "user", "content": prompt}],
-            )
-            label = (resp.choices[0].message.content or "").strip().lower()
+            ).strip().lower()
             if any(x in label for x in ["agent"]):
                 return "agent"
             if any(x in label for x in ["rag", "retrieval"]):
@@ -81,33 +161,26 @@ class RAGPipeline:
         except Exception:
             return "rag"
 
-    def _direct_answer(self, question: str) -> str:
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a concise travel assistant. Answer briefly without retrieval.",
-            },
-        ]
-        messages.extend(self.history.to_messages())
+    def _direct_answer(self, question: str) -> Iterator[str]:
+        packed = pack_prompt(self.settings, DIRECT_SYSTEM_PROMPT, question, history=self.history.to_messages())
+        messages = [{"role": "system", "content": DIRECT_SYSTEM_PROMPT}]
+        messages.extend(packed.history)
         messages.append({"role": "user", "content": question})
-        resp = self.client.chat.completions.create(
-            model=self.settings.chat_model,
-            temperature=0,
-            messages=messages,
-        )
-        return resp.choices[0].message.content
+        return self._stream_chat(messages)
 
-    def _rag_answer(self, question: str, k: int) -> str:
-        internal = self.retrieve(question, k=k)
+    def _rag_answer(self, question: str, k: int) -> Iterator[str]:
+        query_embedding, chunks = self._search(question, k)
         external = external_search(question, self.settings)
-        contexts, source = self._merge_contexts(internal, external)
+        packed = self._pack(question, query_embedding, chunks, external)
+        contexts, source = self._merge_contexts(packed.internal, packed.external)
         prompt = self._build_prompt(question, contexts, source, route="rag")
-        return self._chat(prompt)
+        return self._cached_chat(prompt, question, query_embedding, chunks, external, "rag", packed.history)
 
-    def _agent_answer(self, question: str, k: int) -> str:
-        internal = self.retrieve(question, k=max(k, 4))
+    def _agent_answer(self, question: str, k: int) -> Iterator[str]:
+        query_embedding, chunks = self._search(question, max(k, 4))
         external = external_search(question, self.settings)
-        contexts, source = self._merge_contexts(internal, external)
+        packed = self._pack(question, query_embedding, chunks, external)
+        contexts, source = self._merge_contexts(packed.internal, packed.external)
         prompt = self._build_prompt(
             question,
             contexts,
@@ -115,7 +188,56 @@ class RAGPipeline:
             route="agent",
             agent_instructions="Plan or compare step-by-step. Use all relevant contexts. If something is missing, note it.",
         )
-        return self._chat(prompt)
+        return self._cached_chat(prompt, question, query_embedding, chunks, external, "agent", packed.history)
+
+    def _pack(
+        self,
+        question: str,
+        query_embedding: List[float],
+        chunks: List[RetrievedChunk],
+        external: List[str],
+    ) -> PackedPrompt:
+        """Fit history, (optionally compressed) chunks and external results into the token budget."""
+        return pack_prompt(
+            self.settings,
+            SYSTEM_PROMPT,
+            question,
+            history=self.history.to_messages(),
+            internal=context_texts(self.settings, query_embedding, chunks),
+            external=external,
+        )
+
+    def _cached_chat(
+        self,
+        prompt: str,
+        question: str,
+        query_embedding: List[float],
+        chunks: List[RetrievedChunk],
+        external: List[str],
+        route: str,
+        history: List[dict],
+    ) -> Iterator[str]:
+        """
+        _chat through the answer cache. Bypassed when external search returned live
+        (weather) data, which goes stale, and for follow-ups that depend on history.
+        """
+        cache = self.answers
+        if cache is None or has_live_data(external) or self.history.to_messages():
+            yield from self._chat(prompt, history)
+            return
+        chunk_ids = [chunk.title for chunk in chunks]
+        namespace = f"{self.settings.chat_model}/{route}"
+        cached = cache.lookup(query_embedding, chunk_ids, namespace)
+        if cached is not None:
+            yield cached
+            return
+        parts: List[str] = []
+        for piece in self._chat(prompt, history):
+            parts.append(piece)
+            yield piece
+        answer = "".join(parts)
+        if answer:
+            cache.store(question, query_embedding, chunk_ids, answer, namespace)
 
     def _merge_contexts(self, internal: List[str], external: List[str]) -> Tuple[List[str], str]:
         if internal and external:
@@ -126,24 +248,22 @@ class RAGPipeline:
             return external, "external"
         return [], "none"
 
-    def _chat(self, prompt: str) -> str:
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a travel assistant. ALWAYS ground your answer in provided context blocks. "
-                    "Treat External API context as current information. If context is insufficient, say so."
-                ),
-            }
-        ]
-        messages.extend(self.history.to_messages())
+    def _chat(self, prompt: str, history: List[dict]) -> Iterator[str]:
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages.extend(history)
         messages.append({"role": "user", "content": prompt})
-        resp = self.client.chat.completions.create(
+        return self._stream_chat(messages)
+
+    def _stream_chat(self, messages: List[dict]) -> Iterator[str]:
+        """Chat completion text pieces as they arrive (whole, from the response cache on a repeat)."""
+        return stream_chat_completion(
+            self.settings,
+            self.client,
+            "answer",
             model=self.settings.chat_model,
             temperature=0,
             messages=messages,
         )
-        return resp.choices[0].message.content
 
     @staticmethod
     def _build_prompt(
@@ -0,0 +1,201 @@
+"""
+Exact-match cache for deterministic chat completions.
+
+Every chat call in the pipelines runs at temperature 0, and much of the traffic
+repeats verbatim: router labels, document grades, tool routing and location
+clean-up prompts. chat_completion() / stream_chat_completion() wrap
+`client.chat.completions.create` and key each request on sha256 of its model,
+messages and sampling parameters. A hit returns the stored text without an API call.
+
+Entries live in one SQLite file shared by every project in the workspace (the
+helper prompts are identical across them). Each call passes a kind ("route",
+"grade", "answer", ...) whose TTL comes from `response_cache_ttl_s`; kinds with no
+TTL, or requests with a non-zero temperature, are never cached. The file is capped
+at `response_cache_max_mb` of stored text with LRU eviction, and hits and misses are
+counted per kind.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.config import Settings
+
+
+@dataclass
+class ResponseCacheStats:
+    by_kind: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # kind -> (hits, misses)
+
+    @property
+    def hits(self) -> int:
+        return sum(hits for hits, _ in self.by_kind.values())
+
+    @property
+    def misses(self) -> int:
+        return sum(misses for _, misses in self.by_kind.values())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        kinds = ", ".join(f"{kind} {hits}/{hits + misses}" for kind, (hits, misses) in sorted(self.by_kind.items()))
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate; {kinds or 'no calls'})"
+
+
+class ResponseCache:
+    """sha256(request) -> completion text, with per-kind TTLs and a size-bounded LRU."""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Tuple[int, int]] = {}
+
+    def get(self, key: str, kind: str, ttl_s: float) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM responses WHERE key = ?", [key]).fetchone()
+            if row is not None and row[1] > now - ttl_s:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", [now, key])
+                self._count(kind, hit=True)
+                return row[0]
+            if row is not None:
+                self._db.execute("DELETE FROM responses WHERE key = ?", [key])
+            self._count(kind, hit=False)
+            return None
+
+    def put(self, key: str, kind: str, content: str) -> None:
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, kind, content, size, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [key, kind, content, size, now, now],
+            )
+            self._db.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running
+                        FROM responses
+                    ) WHERE running > ?
+                )
+                """,
+                [max(size, self.max_bytes)],
+            )
+            self._db.execute("COMMIT")
+
+    def stats(self) -> ResponseCacheStats:
+        with self._lock:
+            return ResponseCacheStats(dict(self._counts))
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _count(self, kind: str, hit: bool) -> None:
+        hits, misses = self._counts.get(kind, (0, 0))
+        self._counts[kind] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Stable hash of a chat request; `stream` does not change the text, so it is ignored."""
+    canonical = json.dumps(
+        {name: value for name, value in params.items() if name != "stream"},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+_CACHES: Dict[str, ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_response_cache(settings: Settings) -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None if disabled."""
+    if settings.response_cache_path is None or settings.response_cache_max_mb <= 0:
+        return None
+    key = str(settings.response_cache_path)
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = ResponseCache(settings.response_cache_path, settings.response_cache_max_mb << 20)
+        cache = _CACHES[key]
+        cache.max_bytes = settings.response_cache_max_mb << 20
+        return cache
+
+
+def response_cache_stats() -> ResponseCacheStats:
+    """Hits and misses per kind over every response cache used in this process."""
+    merged: Dict[str, Tuple[int, int]] = {}
+    for cache in list(_CACHES.values()):
+        for kind, (hits, misses) in cache.stats().by_kind.items():
+            old_hits, old_misses = merged.get(kind, (0, 0))
+            merged[kind] = (old_hits + hits, old_misses + misses)
+    return ResponseCacheStats(merged)
+
+
+def chat_completion(settings: Settings, client: Any, kind: str, **params: Any) -> str:
+    """Text of client.chat.completions.create(**params), served from the cache when possible."""
+    cache, ttl_s = _cache_for(settings, kind, params)
+    key = request_key(params) if cache is not None else ""
+    if cache is not None:
+        cached = cache.get(key, kind, ttl_s)
+        if cached is not None:
+            return cached
+    response = client.chat.completions.create(**params)
+    content = response.choices[0].message.content or ""
+    if cache is not None and content:
+        cache.put(key, kind, content)
+    return content
+
+
+def stream_chat_completion(settings: Settings, client: Any, kind: str, **params: Any) -> Iterator[str]:
+    """Streamed text pieces for the request; a cached response arrives as one piece."""
+    cache, ttl_s = _cache_for(settings, kind, params)
+    key = request_key(params) if cache is not None else ""
+    if cache is not None:
+        cached = cache.get(key, kind, ttl_s)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    for event in client.chat.completions.create(**params, stream=True):
+        if event.choices and event.choices[0].delta.content:
+            parts.append(event.choices[0].delta.content)
+            yield event.choices[0].delta.content
+    if cache is not None and parts:
+        cache.put(key, kind, "".join(parts))
+
+
+def _cache_for(settings: Settings, kind: str, params: Dict[str, Any]) -> Tuple[Optional[ResponseCache], float]:
+    ttl_s = settings.response_cache_ttl_s.get(kind, 0.0)
+    if ttl_s <= 0 or params.get("temperature", 1) != 0:
+        return None, 0.0
+    return get_response_cache(settings), ttl_s
@@ -2,12 +2,15 @@
 Thin wrappers around the agentic RAG pipeline.
 """
 
+from src.ingest import IngestStats
 from src.rag_pipeline import RAGPipeline, build_pipeline
 
 
-def ingest_documents(pipeline: RAGPipeline | None = None) -> None:
+def ingest_documents(
+    pipeline: RAGPipeline | None = None, full: bool = False
+) -> IngestStats:
     pipe = pipeline or build_pipeline()
-    pipe.ingest()
+    return pipe.ingest(full=full)
 
 
 def answer_with_context(
@@ -3,20 +3,30 @@ External search for CRAG fallback (public, no API keys).
 
 - Weather/forecast: Open-Meteo geocoding + forecast (free, no key).
 - If not a weather query, returns a simple placeholder noting no live data.
+- Within one answer each lookup runs once per normalized argument (src/tool_memo.py).
+- A caller running the search speculatively can pass a `cancel` event: once it is
+  set, the search stops before its next LLM or HTTP step (SearchCancelled).
 """
 
 import os
 import re
+import threading
 from typing import Callable, Dict, List, Optional, Tuple
 
 import requests
-from openai import OpenAI
 
+from src.clients import get_openai_client
 from src.config import Settings
+from src.response_cache import chat_completion
+from src.tool_memo import memoize_tool
 
 
 ToolHandler = Callable[[str, Settings], Optional[str]]
 
+NO_LIVE_DATA = "(External API) No live data available for"
+
+_HTTP = requests.Session()  # keep-alive connections to the geocoding/forecast APIs
+
 TOOLS: Dict[str, Dict[str, object]] = {
     "weather_forecast": {
         "description": "Get current weather and today forecast for a city or multiple cities",
@@ -26,20 +36,30 @@ TOOLS: Dict[str, Dict[str, object]] = {
 }
 
 
-def external_search(query: str, settings: Optional[Settings] = None) -> List[str]:
+class SearchCancelled(Exception):
+    """external_search stopped because its `cancel` event was set."""
+
+
+@memoize_tool("external_search")
+def external_search(
+    query: str, settings: Optional[Settings] = None, cancel: Optional[threading.Event] = None
+) -> List[str]:
     settings = settings or Settings(
         openai_api_key=os.getenv("OPENAI_API_KEY", ""),
         database_url=os.getenv("DATABASE_URL", ""),
     )
+    _check_cancel(cancel)
     tool_name = select_external_tool(query, settings)
     results: List[str] = []
     locations: List[str] = []
 
     if tool_name == "weather_forecast":
+        _check_cancel(cancel)
         locations = llm_extract_locations(query, settings) or [query]
 
     # If no tool selected but multiple locations found (trip-style queries), fallback to weather
     if not tool_name:
+        _check_cancel(cancel)
         locs = llm_extract_locations(query, settings)
         if locs:
             tool_name = "weather_forecast"
@@ -49,16 +69,28 @@ def external_search(query: str, settings: Optional[Settings] = None) -> List[str
         if not locations:
             locations = [query]
         for loc in locations:
+            _check_cancel(cancel)
             fixed_query = llm_correct_location(loc, settings)
+            _check_cancel(cancel)
             weather = fetch_weather_and_forecast(fixed_query)
             if weather:
                 results.append(weather)
 
     if not results:
-        results.append(f"(External API) No live data available for: {query} (tool selected: {tool_name})")
+        results.append(f"{NO_LIVE_DATA}: {query} (tool selected: {tool_name})")
     return results
 
 
+def _check_cancel(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise SearchCancelled()
+
+
+def has_live_data(results: List[str]) -> bool:
+    """True if external_search returned real API data rather than its placeholder."""
+    return any(not text.startswith(NO_LIVE_DATA) for text in results)
+
+
 def select_external_tool(query: str, settings: Settings) -> Optional[str]:
     """Pick the best external tool using keywords first, then LLM routing."""
     normalized = query.lower()
@@ -70,13 +102,14 @@ def select_external_tool(query: str, settings: Settings) -> Optional[str]:
     return llm_route_tool(query, settings)
 
 
+@memoize_tool("weather_forecast")
 def fetch_weather_and_forecast(query: str) -> Optional[str]:
     location = geocode_location(query)
     if not location:
         return None
     lat, lon, name = location
     try:
-        resp = requests.get(
+        resp = _HTTP.get(
             "https://api.open-meteo.com/v1/forecast",
             params={
                 "latitude": lat,
@@ -105,6 +138,7 @@ def fetch_weather_and_forecast(query: str) -> Optional[str]:
         return None
 
 
+@memoize_tool("geocode")
 def geocode_location(query: str) -> Optional[Tuple[float, float, str]]:
     candidates = []
     tokens = _tokenize(query)
@@ -138,7 +172,7 @@ def geocode_location(query: str) -> Optional[Tuple[float, float, str]]:
 
     for cand in unique_candidates:
         try:
-            resp = requests.get(
+            resp = _HTTP.get(
                 "https://geocoding-api.open-meteo.com/v1/search",
                 params={"name": cand, "count": 1, "language": "en", "format": "json"},
                 timeout=10,
@@ -197,6 +231,7 @@ def _apply_corrections(tokens: List[str]) -> List[str]:
     return corrected
 
 
+@memoize_tool("correct_location")
 def llm_correct_location(query: str, settings: Settings) -> str:
     """
     Use the chat model to clean and correct a location string into 'City, State' (US) format.
@@ -208,18 +243,21 @@ def llm_correct_location(query: str, settings: Settings) -> str:
         f"Location: {query}"
     )
     try:
-        client = OpenAI(api_key=settings.openai_api_key)
-        resp = client.chat.completions.create(
+        content = chat_completion(
+            settings,
+            get_openai_client(settings),
+            "location",
             model=settings.chat_model,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
         )
-        content = resp.choices[0].message.content.strip()
+        content = content.strip()
         return content or query
     except Exception:
         return query
 
 
+@memoize_tool("route_tool")
 def llm_route_tool(query: str, settings: Settings) -> Optional[str]:
     """Use the chat model to pick a tool name from TOOLS or return None."""
     tool_list = ", ".join(TOOLS.keys())
@@ -229,13 +267,15 @@ def llm_route_tool(query: str, settings: Settings) -> Optional[str]:
         f"Request: {query}"
     )
     try:
-        client = OpenAI(api_key=settings.openai_api_key)
-        resp = client.chat.completions.create(
+        content = chat_completion(
+            settings,
+            get_openai_client(settings),
+            "tool",
             model=settings.chat_model,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
         )
-        content = (resp.choices[0].message.content or "").strip().lower()
+        content = content.strip().lower()
         if content in TOOLS:
             return content
         return None
@@ -243,6 +283,7 @@ def llm_route_tool(query: str, settings: Settings) -> Optional[str]:
         return None
 
 
+@memoize_tool("extract_locations")
 def llm_extract_locations(query: str, settings: Settings, max_locations: int = 3) -> List[str]:
     """
     Use LLM to extract up to max_locations location strings from the query.
@@ -254,13 +295,15 @@ def llm_extract_locations(query: str, settings: Settings, max_locations: int = 3
         f"Request: {query}"
     ).format(max_locations=max_locations)
     try:
-        client = OpenAI(api_key=settings.openai_api_key)
-        resp = client.chat.completions.create(
+        content = chat_completion(
+            settings,
+            get_openai_client(settings),
+            "tool",
             model=settings.chat_model,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
         )
-        content = (resp.choices[0].message.content or "").strip()
+        content = content.strip()
         if not content:
             return []
         parts = [p.strip() for p in content.split(",") if p.strip()]
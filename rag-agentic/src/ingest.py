@@ -0,0 +1,181 @@
+"""
+Incremental, streaming ingestion: only new or changed chunks are embedded and written.
+
+Each stored row carries a content hash of (title, content, embed_model, metadata),
+so a metadata change (say a new `region:` in a file's front-matter) rewrites the
+row; the embedding itself then comes from the embedding cache. On every run the
+local corpus is chunked and hashed, rows whose hash already matches are skipped,
+and rows that no longer exist locally (deleted files, or trailing chunks of files
+that got shorter) are removed.
+
+Work flows through overlapping stages so memory stays bounded by the batch size
+rather than the corpus size:
+
+    iter_chunks -> hash filter -> batches of `ingest_batch_size`
+        -> embed (up to `embed_max_concurrency` batches in flight)
+        -> background writer thread -> VectorStore.upsert
+
+The first batches reach Postgres while later files are still being read, and the
+ANN index is (re)built only after the load so ivfflat trains on real data. With
+`compress_contexts` on, each batch's sentences are embedded alongside it (see
+src/compression.py). Unchanged chunks then still pass through the embed stage for
+their sentences alone, so turning compression on after a load fills the embedding
+cache on the next ingest; sentences already cached cost only a lookup.
+"""
+
+import hashlib
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.compression import chunk_sentences
+from src.config import Settings
+from src.data_loader import DocumentMetadata, iter_chunks
+from src.embedding_cache import get_embedding_cache
+from src.embeddings import embed_texts
+from src.vector_store import VectorStore, get_vector_store
+
+# (title, content, content_hash, metadata); content_hash is None for an unchanged chunk
+# passed along only so its sentences are embedded.
+PendingChunk = Tuple[str, str, Optional[str], DocumentMetadata]
+
+
+@dataclass
+class IngestStats:
+    embedded: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.embedded} embedded, {self.unchanged} unchanged, {self.deleted} removed"
+
+
+def content_hash(title: str, content: str, embed_model: str, metadata: DocumentMetadata) -> str:
+    digest = hashlib.sha256()
+    for part in (title, content, embed_model, metadata.source, metadata.region or "", ",".join(metadata.tags)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def ingest_corpus(
+    settings: Settings, full: bool = False, store: Optional[VectorStore] = None
+) -> IngestStats:
+    """
+    Sync the data directory into the configured vector store.
+    With full=True every chunk is re-embedded regardless of its stored hash.
+    """
+    store = store or get_vector_store(settings)
+    store.ensure_schema()
+    existing = store.content_hashes()
+    stats = IngestStats()
+    seen: Set[str] = set()
+    backfill = _embeds_sentences(settings)
+
+    def pending_chunks() -> Iterator[PendingChunk]:
+        for chunk in iter_chunks(
+            settings.data_dir,
+            chunk_size=settings.chunk_size,
+            overlap=settings.chunk_overlap,
+        ):
+            seen.add(chunk.title)
+            digest = content_hash(chunk.title, chunk.content, settings.embed_model, chunk.metadata)
+            if not full and existing.get(chunk.title) == digest:
+                stats.unchanged += 1
+                if backfill:
+                    yield chunk.title, chunk.content, None, chunk.metadata
+                continue
+            yield chunk.title, chunk.content, digest, chunk.metadata
+
+    depth = max(1, settings.embed_max_concurrency)
+    in_flight: Deque[Tuple[List[PendingChunk], Future]] = deque()
+    with _BackgroundWriter(store, max_pending=depth) as writer, ThreadPoolExecutor(
+        max_workers=depth
+    ) as pool:
+        for batch in _batched(pending_chunks(), settings.ingest_batch_size):
+            future = pool.submit(_embed_batch, settings, batch)
+            in_flight.append((batch, future))
+            if len(in_flight) >= depth:
+                stats.embedded += writer.put(*in_flight.popleft())
+        while in_flight:
+            stats.embedded += writer.put(*in_flight.popleft())
+
+    if not seen:
+        raise ValueError(f"No .txt documents found in {settings.data_dir}")
+    stats.deleted = store.delete(set(existing) - seen)
+    store.build_index()
+    store.check_index()
+    return stats
+
+
+class _BackgroundWriter:
+    """Upserts embedded batches on a worker thread through a bounded queue."""
+
+    def __init__(self, store: VectorStore, max_pending: int):
+        self.store = store
+        self._queue: "queue.Queue[Optional[list]]" = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+
+    def __enter__(self) -> "_BackgroundWriter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None and exc is None:
+            raise self._error
+
+    def put(self, batch: List[PendingChunk], embeddings: Future) -> int:
+        """Wait for a batch's embeddings and hand the rows to the writer."""
+        if self._error is not None:
+            raise self._error
+        changed = [item for item in batch if item[2] is not None]
+        rows = [
+            (title, content, embedding, digest, meta.source, meta.region, meta.tags)
+            for (title, content, digest, meta), embedding in zip(changed, embeddings.result())
+        ]
+        if rows:
+            self._queue.put(rows)
+        return len(rows)
+
+    def _run(self) -> None:
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                return
+            if self._error is None:
+                try:
+                    self.store.upsert(rows)
+                except BaseException as err:  # surfaced to the producer thread
+                    self._error = err
+
+
+def _embeds_sentences(settings: Settings) -> bool:
+    """Sentence embeddings are only worth computing at ingest if they can be cached."""
+    return settings.compress_contexts and get_embedding_cache(settings) is not None
+
+
+def _embed_batch(settings: Settings, batch: List[PendingChunk]) -> List[List[float]]:
+    """
+    Embeddings of the batch's changed chunks. With compression on, the sentences of
+    every chunk in the batch are embedded in the same requests so query-time
+    compression finds them cached.
+    """
+    contents = [content for _, content, digest, _ in batch if digest is not None]
+    sentences = chunk_sentences(content for _, content, _, _ in batch) if _embeds_sentences(settings) else []
+    return embed_texts(settings, contents + sentences)[: len(contents)]
+
+
+def _batched(items: Iterable[PendingChunk], size: int) -> Iterator[List[PendingChunk]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, max(1, size)))
+        if not batch:
+            return
+        yield batch
@@ -1,52 +1,113 @@
 from textwrap import dedent
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from langchain.tools import tool
-from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
 from langgraph.graph import END, START, StateGraph
 from typing_extensions import Annotated, TypedDict
 import operator
 from langchain_openai import ChatOpenAI
 
-from src import db
+from src.clients import get_http_client
+from src.compression import context_texts
 from src.config import Settings, load_settings
 from src.conversation import ConversationHistory
-from src.data_loader import load_documents
-from src.embeddings import embed_text
 from src.external_search import external_search
+from src.filters import SearchFilter
+from src.ingest import IngestStats, ingest_corpus
+from src.prompt_packer import pack_prompt
+from src.query_cache import embed_queries, embed_query
+from src.retrieval import RetrievedChunk, candidate_pool, select_chunks
+from src.tool_memo import tool_memo_scope
 from src.tools import ToolResult, run_tools
+from src.vector_store import get_vector_store
+
+SYSTEM_PROMPT = (
+    "You are an agentic travel assistant. Plan, reason, and use tools to gather evidence. "
+    "Cite sources from tool outputs. If insufficient info, say so."
+)
 
 
 class RAGPipeline:
     def __init__(self, settings: Settings, history: Optional[ConversationHistory] = None):
         self.settings = settings
+        self.store = get_vector_store(settings)
         self.history = history or ConversationHistory(max_turns=settings.history_size)
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        self.llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0,
+            timeout=settings.openai_timeout_s,
+            max_retries=settings.openai_max_retries,
+            http_client=get_http_client(settings),
+        )
         self._agent = None
 
-    def ingest(self) -> None:
-        documents = load_documents(
-            self.settings.data_dir,
-            chunk_size=self.settings.chunk_size,
-            overlap=self.settings.chunk_overlap,
+    def close(self) -> None:
+        """Release what this pipeline holds; the shared database pool stays open for other users."""
+        self.store.close()
+
+    def ingest(self, full: bool = False) -> IngestStats:
+        return ingest_corpus(self.settings, full=full, store=self.store)
+
+    def retrieve(
+        self,
+        question: str,
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[RetrievedChunk]:
+        query_embedding = embed_query(self.settings, question)
+        pool = candidate_pool(self.settings, k)
+        rows = self.store.fetch_similar(
+            query_embedding,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_text=question,
+            filters=filters,
+            with_embeddings=pool > k,
+        )
+        return select_chunks(self.settings, query_embedding, rows, k)
+
+    def retrieve_many(
+        self,
+        questions: Sequence[str],
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        retrieve() for a batch of questions: one embeddings request for the uncached
+        questions and one store query, returning up to k chunks per question.
+        """
+        embeddings = embed_queries(self.settings, questions)
+        pool = candidate_pool(self.settings, k)
+        results = self.store.fetch_similar_many(
+            embeddings,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_texts=questions,
+            filters=filters,
+            with_embeddings=pool > k,
         )
-        db.ensure_schema(self.settings)
-        payload = []
-        for title, content in documents:
-            embedding = embed_text(self.settings, content)
-            payload.append((title, content, embedding))
-        db.upsert_documents(self.settings, payload)
-
-    def retrieve(self, question: str, k: int = 3) -> List[str]:
-        query_embedding = embed_text(self.settings, question)
-        rows = db.fetch_similar(self.settings, query_embedding, limit=k)
-        return [content for _, content, _ in rows]
+        return [
+            select_chunks(self.settings, embedding, rows, k) for embedding, rows in zip(embeddings, results)
+        ]
 
     def answer(self, question: str, k: int = 3) -> str:
         agent = self._build_agent(k)
-        history_msgs = self.history.to_langchain()
+        # Tool output is bounded per call by the retrieval token budget; history is packed here.
+        packed = pack_prompt(self.settings, SYSTEM_PROMPT, question, history=self.history.to_messages())
+        history_msgs: List[AnyMessage] = [
+            HumanMessage(content=msg["content"]) if msg["role"] == "user" else AIMessage(content=msg["content"])
+            for msg in packed.history
+        ]
         messages: List[AnyMessage] = history_msgs + [HumanMessage(content=question)]
-        result = agent.invoke({"messages": messages, "llm_calls": 0})
+        with tool_memo_scope():  # repeated tool calls within one answer are served from the memo
+            result = agent.invoke({"messages": messages, "llm_calls": 0})
         final_messages = result["messages"]
         answer = final_messages[-1].content if final_messages else ""
         # Add last turn to history
@@ -60,8 +121,9 @@ class RAGPipeline:
         @tool
         def vector_search(query: str) -> str:
             """Search internal travel docs."""
-            rows = self.retrieve(query, k=k)
-            return "\n\n".join(rows) if rows else "No internal results."
+            chunks = self.retrieve(query, k=k)
+            contexts = context_texts(self.settings, embed_query(self.settings, query), chunks)
+            return "\n\n".join(contexts) if contexts else "No internal results."
 
         @tool
         def weather_lookup(query: str) -> str:
@@ -79,12 +141,7 @@ class RAGPipeline:
 
         def llm_call(state: dict):
             """LLM decides to call tools or answer."""
-            sys_msg = SystemMessage(
-                content=(
-                    "You are an agentic travel assistant. Plan, reason, and use tools to gather evidence. "
-                    "Cite sources from tool outputs. If insufficient info, say so."
-                )
-            )
+            sys_msg = SystemMessage(content=SYSTEM_PROMPT)
             result = model_with_tools.invoke([sys_msg] + state["messages"])
             return {"messages": [result], "llm_calls": state.get("llm_calls", 0) + 1}
 
@@ -0,0 +1,112 @@
+"""
+Request-scoped memoization of external tool calls.
+
+One answer can ask for the same lookup several times: the CRAG gate and the weather
+check both search the question, a multi-city query corrects and geocodes the same
+city more than once, and an agent may repeat a tool call. Inside
+`with tool_memo_scope():` every function decorated with @memoize_tool runs at most
+once per tool name and normalized arguments (Unicode NFKC, case-folded, whitespace
+collapsed; Settings arguments are ignored). Outside a scope the functions run
+unmemoized, so live data such as weather is never reused across answers.
+
+The scope lives in a ContextVar: code run via contextvars.copy_context() (worker
+threads, LangGraph tool nodes) shares the memo of the answer that started it. The
+memo holds one Future per call, so a thread asking for a lookup that another thread
+is already running (say the speculative CRAG search) waits for that result instead
+of repeating the call. A call that raises is not memoized; a waiting thread then
+runs it itself.
+"""
+
+import functools
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple, TypeVar
+
+from src.config import Settings
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_WHITESPACE = re.compile(r"\s+")
+_MEMO: ContextVar[Optional[Dict[Tuple[str, Hashable], Future]]] = ContextVar("tool_memo", default=None)
+_MEMO_LOCK = threading.Lock()  # guards every memo's check-and-claim
+
+
+@contextmanager
+def tool_memo_scope() -> Iterator[None]:
+    """Memoize tool calls made inside this block; nested scopes share the outer memo."""
+    if _MEMO.get() is not None:
+        yield
+        return
+    token = _MEMO.set({})
+    try:
+        yield
+    finally:
+        _MEMO.reset(token)
+
+
+def memoize_tool(name: str) -> Callable[[F], F]:
+    """Decorator: reuse the tool's result for equal normalized arguments within a scope."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            memo = _MEMO.get()
+            if memo is None:
+                return fn(*args, **kwargs)
+            key = (name, _normalize_args(args, kwargs))
+            result = _memoized_call(memo, key, fn, args, kwargs)
+            return list(result) if isinstance(result, list) else result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def _memoized_call(
+    memo: Dict[Tuple[str, Hashable], Future],
+    key: Tuple[str, Hashable],
+    fn: Callable[..., Any],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> Any:
+    """Run fn once per key; concurrent callers wait for the running call's result."""
+    while True:
+        with _MEMO_LOCK:
+            pending = memo.get(key)
+            running_elsewhere = pending is not None
+            if not running_elsewhere:
+                pending = memo[key] = Future()
+        if running_elsewhere:
+            try:
+                return pending.result()
+            except Exception:
+                continue  # the other call failed and was dropped from the memo; run it here
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as err:
+            with _MEMO_LOCK:
+                memo.pop(key, None)
+            pending.set_exception(err)
+            raise
+        pending.set_result(result)
+        return result
+
+
+def _normalize(value: Any) -> Hashable:
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", value).casefold()).strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return value if isinstance(value, Hashable) else repr(value)
+
+
+def _normalize_args(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    positional = tuple(_normalize(arg) for arg in args if not isinstance(arg, Settings))
+    named = tuple(
+        sorted((key, _normalize(value)) for key, value in kwargs.items() if not isinstance(value, Settings))
+    )
+    return positional, named
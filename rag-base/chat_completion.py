@@ -5,12 +5,17 @@ The heavy lifting lives in src/rag_pipeline.py; this module exposes thin wrapper
 for ingestion and querying so other scripts can import them easily.
 """
 
+from typing import Iterator
+
+from src.ingest import IngestStats
 from src.rag_pipeline import RAGPipeline, build_pipeline
 
 
-def ingest_documents(pipeline: RAGPipeline | None = None) -> None:
+def ingest_documents(
+    pipeline: RAGPipeline | None = None, full: bool = False
+) -> IngestStats:
     pipe = pipeline or build_pipeline()
-    pipe.ingest()
+    return pipe.ingest(full=full)
 
 
 def answer_with_context(
@@ -19,6 +24,13 @@ def answer_with_context(
     pipe = pipeline or build_pipeline()
     return pipe.answer(question, k=k)
 
+
+def stream_answer_with_context(
+    question: str, pipeline: RAGPipeline | None = None, k: int = 3
+) -> Iterator[str]:
+    pipe = pipeline or build_pipeline()
+    return pipe.answer_stream(question, k=k)
+
 if __name__ == "__main__":
     print("Chat started. Type 'exit' or 'quit' to stop.\n")
 
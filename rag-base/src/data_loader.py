@@ -1,5 +1,42 @@
+import re
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Filename words that name a region, mapped to the canonical region stored per chunk.
+REGION_ALIASES: Dict[str, str] = {
+    "global": "global",
+    "world": "global",
+    "europe": "europe",
+    "eu": "europe",
+    "asia": "asia",
+    "usa": "north_america",
+    "us": "north_america",
+    "america": "north_america",
+    "canada": "north_america",
+    "mexico": "north_america",
+    "latam": "south_america",
+    "africa": "africa",
+    "oceania": "oceania",
+    "australia": "oceania",
+    "middle_east": "middle_east",
+}
+
+_FRONT_MATTER = re.compile(r"\A---\s*\n(.*?)\n---\s*(?:\n|\Z)", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class DocumentMetadata:
+    source: str  # file stem, e.g. "03_europe_rail"
+    region: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class Chunk:
+    title: str
+    content: str
+    metadata: DocumentMetadata
 
 
 def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
@@ -19,23 +56,63 @@ def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
     return chunks
 
 
-def load_documents(data_dir: Path, chunk_size: int, overlap: int) -> List[Tuple[str, str]]:
+def parse_metadata(stem: str, text: str) -> Tuple[DocumentMetadata, str]:
     """
-    Load documents from the data directory and return chunked (title, content) tuples.
-    Titles include chunk indices for uniqueness.
+    Derive metadata for one file and return it with the text minus any front-matter.
+
+    Filenames like `03_europe_rail` give region "europe" and tags ("rail",); files
+    naming no region are "global". A leading `---` block of `key: value` lines can set
+    `region` and add `tags` (comma-separated, optionally in [brackets]).
+    """
+    words = [word for word in stem.lower().split("_") if word and not word.isdigit()]
+    region = next((REGION_ALIASES[word] for word in words if word in REGION_ALIASES), "global")
+    tags = [word for word in words if word not in REGION_ALIASES]
+
+    match = _FRONT_MATTER.match(text)
+    if match:
+        text = text[match.end() :]
+        for line in match.group(1).splitlines():
+            key, _, value = line.partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "region" and value:
+                region = REGION_ALIASES.get(value.lower(), value.lower())
+            elif key == "tags":
+                tags.extend(tag.strip().lower() for tag in value.strip("[]").split(",") if tag.strip())
+    return DocumentMetadata(source=stem, region=region, tags=tuple(dict.fromkeys(tags))), text.strip()
+
+
+def iter_chunks(data_dir: Path, chunk_size: int, overlap: int) -> Iterator[Chunk]:
+    """
+    Yield chunks with their file's metadata, file by file, without holding the corpus
+    in memory. Titles include chunk indices for uniqueness.
     """
-    documents: List[Tuple[str, str]] = []
     if not data_dir.exists():
         raise FileNotFoundError(f"Data directory not found: {data_dir}")
 
     for path in sorted(data_dir.glob("*.txt")):
-        content = path.read_text(encoding="utf-8").strip()
+        metadata, content = parse_metadata(path.stem, path.read_text(encoding="utf-8").strip())
         if not content:
             continue
         chunks = chunk_text(content, chunk_size=chunk_size, overlap=overlap)
         for idx, chunk in enumerate(chunks, start=1):
-            title = f"{path.stem}-chunk-{idx}"
-            documents.append((title, chunk))
+            yield Chunk(title=f"{path.stem}-chunk-{idx}", content=chunk, metadata=metadata)
+
+
+def iter_documents(data_dir: Path, chunk_size: int, overlap: int) -> Iterator[Tuple[str, str]]:
+    """
+    Yield chunked (title, content) tuples file by file, without holding the corpus in memory.
+    Titles include chunk indices for uniqueness.
+    """
+    for chunk in iter_chunks(data_dir, chunk_size=chunk_size, overlap=overlap):
+        yield chunk.title, chunk.content
+
+
+def load_documents(data_dir: Path, chunk_size: int, overlap: int) -> List[Tuple[str, str]]:
+    """
+    Load documents from the data directory and return chunked (title, content) tuples.
+    Titles include chunk indices for uniqueness.
+    """
+    documents = list(iter_documents(data_dir, chunk_size=chunk_size, overlap=overlap))
     if not documents:
         raise ValueError(f"No .txt documents found in {data_dir}")
     return documents
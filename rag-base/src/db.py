@@ -1,38 +1,211 @@
-from typing import Iterable, List, Tuple
+import atexit
+import io
+import math
+import re
+import struct
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import numpy as np
 import psycopg2
 from psycopg2 import OperationalError
 from psycopg2 import sql
-from psycopg2.extras import execute_values
+from psycopg2.extensions import STATUS_READY
+from psycopg2.pool import ThreadedConnectionPool
 from pgvector.psycopg2 import register_vector
 
 from src.config import Settings
+from src.filters import SearchFilter
 
+# Index operator class and query operator must agree or the ANN index is unusable.
+DISTANCE_METRICS: Dict[str, Tuple[str, str]] = {
+    "cosine": ("vector_cosine_ops", "<=>"),
+    "l2": ("vector_l2_ops", "<->"),
+    "inner_product": ("vector_ip_ops", "<#>"),
+}
 
-def get_connection(settings: Settings, register: bool = True):
-    try:
-        conn = psycopg2.connect(settings.database_url)
-        if register:
+
+class _KeepIdlePool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that keeps up to `maxconn` returned connections open for
+    reuse. psycopg2 itself closes a returned connection once `minconn` are idle, and
+    `minconn` is also how many it opens up front.
+    """
+
+    def _putconn(self, conn, key=None, close=False):
+        # Runs under the pool lock, so no other caller sees the swapped minconn.
+        minconn, self.minconn = self.minconn, self.maxconn
+        try:
+            super()._putconn(conn, key, close)
+        finally:
+            self.minconn = minconn
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool shared by everything in the process.
+
+    Connections run in autocommit mode so a read is a single round trip; callers that
+    need a transaction ask for autocommit=False. pgvector types are registered once
+    per physical connection, and connections idle for longer than
+    `db_pool_health_check_s` are pinged (and replaced if dead) before reuse.
+    Checkout blocks instead of failing when all `db_pool_max` connections are busy.
+    Only `db_pool_min` connections are opened up front; up to `db_pool_max` stay open
+    between uses. The pool lives as long as the process and is closed at exit by
+    close_pools(), never by one of its users.
+    """
+
+    def __init__(self, settings: Settings):
+        self.database_url = settings.database_url
+        self.health_check_after = settings.db_pool_health_check_s
+        try:
+            self._pool = _KeepIdlePool(settings.db_pool_min, settings.db_pool_max, settings.database_url)
+        except OperationalError as err:
+            raise _connection_error(settings.database_url) from err
+        self._slots = threading.BoundedSemaphore(settings.db_pool_max)
+        # Keyed by the connection object, so state never outlives its connection.
+        self._registered: "weakref.WeakSet" = weakref.WeakSet()
+        self._idle_since: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def getconn(self, register: bool = True):
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            if register:
+                self.register(conn)
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close: bool = False) -> None:
+        try:
+            if not close and not conn.closed:
+                try:
+                    if conn.status != STATUS_READY:
+                        conn.rollback()
+                    conn.autocommit = True
+                except psycopg2.Error:
+                    close = True
+            close = close or bool(conn.closed)
+            if not close:
+                self._idle_since[conn] = time.monotonic()
+            self._pool.putconn(conn, close=close)
+            if conn.closed:
+                self._forget(conn)
+        finally:
+            self._slots.release()
+
+    def register(self, conn) -> None:
+        """Register pgvector adapters on a connection unless already done."""
+        if conn in self._registered:
+            return
+        try:
+            register_vector(conn)
+        except psycopg2.ProgrammingError as err:
+            raise RuntimeError(
+                "pgvector extension is missing in the target database. "
+                "Create it with: CREATE EXTENSION IF NOT EXISTS vector;"
+            ) from err
+        self._registered.add(conn)
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._pool.closed)
+
+    def closeall(self) -> None:
+        if not self._pool.closed:
+            self._pool.closeall()
+        self._registered.clear()
+        self._idle_since.clear()
+
+    def _checkout(self):
+        for _ in range(2):
             try:
-                register_vector(conn)
-            except psycopg2.ProgrammingError as err:
-                raise RuntimeError(
-                    "pgvector extension is missing in the target database. "
-                    "Create it with: CREATE EXTENSION IF NOT EXISTS vector;"
-                ) from err
-        return conn
-    except OperationalError as err:
-        raise RuntimeError(
-            f"Could not connect to PostgreSQL at DATABASE_URL={settings.database_url}. "
-            "Ensure the server is running and accepting connections, or set DATABASE_URL to a reachable instance."
-        ) from err
+                conn = self._pool.getconn()
+            except OperationalError as err:
+                raise _connection_error(self.database_url) from err
+            if self._healthy(conn):
+                conn.autocommit = True
+                return conn
+            self._forget(conn)
+            self._pool.putconn(conn, close=True)
+        raise RuntimeError(f"Could not get a healthy connection to DATABASE_URL={self.database_url}.")
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        idle_since = self._idle_since.get(conn)
+        if idle_since is None or time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _forget(self, conn) -> None:
+        self._registered.discard(conn)
+        self._idle_since.pop(conn, None)
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(settings: Settings) -> ConnectionPool:
+    """Return the process-wide pool for settings.database_url, creating it on first use."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(settings.database_url)
+        if pool is None or pool.closed:
+            pool = _POOLS[settings.database_url] = ConnectionPool(settings)
+        return pool
+
+
+@atexit.register
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.closeall()
+        _POOLS.clear()
+
+
+@contextmanager
+def get_connection(settings: Settings, register: bool = True, autocommit: bool = True) -> Iterator:
+    """
+    Borrow a pooled connection for the duration of the block.
+    With autocommit=False the caller commits; anything left uncommitted is rolled back.
+    """
+    pool = get_pool(settings)
+    conn = pool.getconn(register=register)
+    broken = False
+    try:
+        conn.autocommit = autocommit
+        yield conn
+    except (OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+
+def _connection_error(database_url: str) -> RuntimeError:
+    return RuntimeError(
+        f"Could not connect to PostgreSQL at DATABASE_URL={database_url}. "
+        "Ensure the server is running and accepting connections, or set DATABASE_URL to a reachable instance."
+    )
 
 
 def ensure_schema(settings: Settings) -> None:
     """Ensure pgvector extension and the documents table exist."""
-    with get_connection(settings, register=False) as conn, conn.cursor() as cur:
+    with get_connection(settings, register=False, autocommit=False) as conn, conn.cursor() as cur:
         cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
-        register_vector(conn)
+        get_pool(settings).register(conn)
         cur.execute(
             sql.SQL(
                 """
@@ -40,67 +213,616 @@ def ensure_schema(settings: Settings) -> None:
                     id SERIAL PRIMARY KEY,
                     title TEXT UNIQUE,
                     content TEXT,
-                    embedding vector(%s)
+                    embedding vector(%s),
+                    content_hash TEXT
                 )
                 """
             ).format(table=sql.Identifier(settings.table_name)),
             [settings.embed_dim],
         )
+        # Tables created before incremental ingestion lack the hash column.
+        cur.execute(
+            sql.SQL("ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash TEXT").format(
+                table=sql.Identifier(settings.table_name)
+            )
+        )
+        # Keyword side of hybrid retrieval: a generated tsvector kept in sync by Postgres.
         cur.execute(
             sql.SQL(
                 """
-                CREATE INDEX IF NOT EXISTS {index_name}
-                ON {table}
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100)
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector
+                GENERATED ALWAYS AS (
+                    to_tsvector({config}, coalesce(title, '') || ' ' || coalesce(content, ''))
+                ) STORED
                 """
             ).format(
-                index_name=sql.Identifier(f"{settings.table_name}_embedding_idx"),
+                table=sql.Identifier(settings.table_name),
+                config=sql.Literal(settings.text_search_config),
+            )
+        )
+        cur.execute(
+            sql.SQL("CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (search_tsv)").format(
+                index=sql.Identifier(f"{settings.table_name}_search_idx"),
                 table=sql.Identifier(settings.table_name),
             )
         )
+        # Chunk metadata for filtered retrieval (src/filters.py), filled in by ingest.
+        for column, kind in (("source", "TEXT"), ("region", "TEXT"), ("tags", "TEXT[]")):
+            cur.execute(
+                sql.SQL("ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {kind}").format(
+                    table=sql.Identifier(settings.table_name),
+                    column=sql.Identifier(column),
+                    kind=sql.SQL(kind),
+                )
+            )
+        for column, method in (("source", "btree"), ("region", "btree"), ("tags", "gin")):
+            cur.execute(
+                sql.SQL("CREATE INDEX IF NOT EXISTS {index} ON {table} USING {method} ({column})").format(
+                    index=sql.Identifier(f"{settings.table_name}_{column}_idx"),
+                    table=sql.Identifier(settings.table_name),
+                    method=sql.SQL(method),
+                    column=sql.Identifier(column),
+                )
+            )
         conn.commit()
 
 
-def upsert_documents(
-    settings: Settings, documents: Iterable[Tuple[str, str, List[float]]]
-) -> None:
-    """Insert or update documents with embeddings."""
-    records = list(documents)
-    if not records:
+DOCUMENT_COLUMNS = ("title", "content", "embedding", "content_hash", "source", "region", "tags")
+
+
+def upsert_documents(settings: Settings, documents: Iterable[Tuple]) -> None:
+    """
+    Insert or update (title, content, embedding, content_hash, source, region, tags) rows.
+
+    Rows are streamed with binary COPY into a session-local staging table (temp
+    tables are never WAL-logged) and merged with one INSERT ... SELECT ... ON CONFLICT
+    per batch. Each batch of `copy_batch_size` rows is committed separately.
+    """
+    rows = iter(documents)
+    batch = list(islice(rows, settings.copy_batch_size))
+    if not batch:
         return
 
-    with get_connection(settings) as conn, conn.cursor() as cur:
-        execute_values(
-            cur,
+    table = sql.Identifier(settings.table_name)
+    staging = sql.Identifier(f"{settings.table_name}_staging")
+    columns = sql.SQL(", ").join(map(sql.Identifier, DOCUMENT_COLUMNS))
+    updates = sql.SQL(", ").join(
+        sql.SQL("{col} = EXCLUDED.{col}").format(col=sql.Identifier(col))
+        for col in DOCUMENT_COLUMNS
+        if col != "title"
+    )
+    with get_connection(settings, register=False, autocommit=False) as conn, conn.cursor() as cur:
+        cur.execute(
             sql.SQL(
                 """
-                INSERT INTO {table} (title, content, embedding)
-                VALUES %s
-                ON CONFLICT (title) DO UPDATE
-                SET content = EXCLUDED.content,
-                    embedding = EXCLUDED.embedding
+                CREATE TEMP TABLE IF NOT EXISTS {staging}
+                (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
                 """
-            ).format(table=sql.Identifier(settings.table_name)),
-            records,
+            ).format(staging=staging, table=table)
+        )
+        while batch:
+            cur.copy_expert(
+                sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT binary)")
+                .format(staging=staging, columns=columns)
+                .as_string(conn),
+                io.BytesIO(_encode_copy_binary(batch, settings.embed_dim)),
+            )
+            cur.execute(
+                sql.SQL(
+                    """
+                    INSERT INTO {table} ({columns})
+                    SELECT {columns} FROM {staging}
+                    ON CONFLICT (title) DO UPDATE
+                    SET {updates}
+                    """
+                ).format(table=table, staging=staging, columns=columns, updates=updates)
+            )
+            conn.commit()
+            batch = list(islice(rows, settings.copy_batch_size))
+
+
+def _encode_copy_binary(rows: List[Tuple], dim: int) -> bytes:
+    """Encode rows in PostgreSQL's binary COPY format (text, text[] from tuples, and pgvector fields)."""
+    out = bytearray(b"PGCOPY\n\xff\r\n\x00")
+    out += struct.pack("!ii", 0, 0)  # flags, header extension length
+    for row in rows:
+        out += struct.pack("!h", len(row))
+        for value in row:
+            if value is None:
+                out += struct.pack("!i", -1)
+                continue
+            if isinstance(value, str):
+                data = value.encode("utf-8")
+            elif isinstance(value, tuple):
+                data = _encode_text_array(value)
+            else:
+                # pgvector binary format: int16 dim, int16 unused, float4[dim]
+                vector = np.asarray(value, dtype=">f4")
+                if vector.shape != (dim,):
+                    raise ValueError(f"Expected a {dim}-dimensional embedding, got shape {vector.shape}")
+                data = struct.pack("!hh", dim, 0) + vector.tobytes()
+            out += struct.pack("!i", len(data))
+            out += data
+    out += struct.pack("!h", -1)
+    return bytes(out)
+
+
+def _encode_text_array(values: Tuple[str, ...]) -> bytes:
+    # array binary format: ndim, has-nulls flag, element type oid (25 = text),
+    # then (length, lower bound) per dimension and (length, bytes) per element.
+    if not values:
+        return struct.pack("!iii", 0, 0, 25)
+    data = bytearray(struct.pack("!iiiii", 1, 0, 25, len(values), 1))
+    for value in values:
+        item = value.encode("utf-8")
+        data += struct.pack("!i", len(item)) + item
+    return bytes(data)
+
+
+def fetch_content_hashes(settings: Settings) -> Dict[str, Optional[str]]:
+    """Return {title: content_hash} for every stored document."""
+    with get_connection(settings, register=False) as conn, conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("SELECT title, content_hash FROM {table}").format(
+                table=sql.Identifier(settings.table_name)
+            )
+        )
+        return dict(cur.fetchall())
+
+
+def delete_documents(settings: Settings, titles: Iterable[str]) -> int:
+    """Delete documents by title and return the number of rows removed."""
+    doomed = list(titles)
+    if not doomed:
+        return 0
+    with get_connection(settings, register=False) as conn, conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("DELETE FROM {table} WHERE title = ANY(%s)").format(
+                table=sql.Identifier(settings.table_name)
+            ),
+            [doomed],
         )
+        return cur.rowcount
+
+
+def build_index(settings: Settings, force: bool = False) -> str:
+    """
+    Create (or rebuild) the ANN index once the table is loaded, and describe it.
+
+    ivfflat trains its centroids on existing rows, so `lists` is sized from the row
+    count (rows / 1000, or sqrt(rows) past one million) and the index is rebuilt when
+    the table has grown or shrunk enough to make the current size a poor fit. HNSW
+    needs no training and is built with the configured m / ef_construction. An index
+    built for another metric or index type is replaced. With force=True the index is
+    always rebuilt.
+    """
+    opclass, _ = distance_metric(settings)
+    index_name = f"{settings.table_name}_embedding_idx"
+    with get_connection(settings, register=False, autocommit=False) as conn, conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("SELECT count(*) FROM {table}").format(table=sql.Identifier(settings.table_name))
+        )
+        rows = cur.fetchone()[0]
+        if settings.index_type == "hnsw":
+            method = "hnsw"
+            params = {"m": settings.hnsw_m, "ef_construction": settings.hnsw_ef_construction}
+        elif settings.index_type == "ivfflat":
+            if rows == 0:
+                return "none (ivfflat needs rows to train; build after loading)"
+            method = "ivfflat"
+            params = {"lists": ivfflat_lists(rows)}
+        else:
+            raise ValueError(f"Unknown index_type {settings.index_type!r}; expected hnsw or ivfflat")
+
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", [index_name])
+        found = cur.fetchone()
+        description = f"{method} ({', '.join(f'{k}={v}' for k, v in params.items())})"
+        if not (found and not force and _index_fits(found[0], method, opclass, params)):
+            cur.execute(sql.SQL("DROP INDEX IF EXISTS {index}").format(index=sql.Identifier(index_name)))
+            cur.execute(_create_index(settings, index_name, method, opclass, params))
+        regions = _build_region_indexes(cur, settings, method, opclass, params, force)
         conn.commit()
+    if regions:
+        description += f", per-region: {', '.join(regions)}"
+    return description
+
+
+def _build_region_indexes(
+    cur, settings: Settings, method: str, opclass: str, params: Dict[str, int], force: bool
+) -> List[str]:
+    """
+    Keep one partial ANN index per region in settings.partial_index_regions and drop
+    those for regions no longer listed. A query filtered to one region then scans only
+    that region's graph/lists instead of post-filtering the whole-table index, which
+    (pgvector < 0.8 has no iterative scans) can return fewer than k rows.
+    """
+    wanted = {region_index_name(settings, region): region for region in settings.partial_index_regions}
+    cur.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexdef LIKE %s",
+        [settings.table_name, "% WHERE (region = %"],
+    )
+    existing = dict(cur.fetchall())
+    for name in set(existing) - set(wanted):
+        cur.execute(sql.SQL("DROP INDEX IF EXISTS {index}").format(index=sql.Identifier(name)))
+
+    built = []
+    for name, region in wanted.items():
+        region_params = dict(params)
+        if method == "ivfflat":
+            cur.execute(
+                sql.SQL("SELECT count(*) FROM {table} WHERE region = %s").format(
+                    table=sql.Identifier(settings.table_name)
+                ),
+                [region],
+            )
+            rows = cur.fetchone()[0]
+            if rows == 0:
+                continue
+            region_params["lists"] = ivfflat_lists(rows)
+        if force or name not in existing or not _index_fits(existing[name], method, opclass, region_params):
+            cur.execute(sql.SQL("DROP INDEX IF EXISTS {index}").format(index=sql.Identifier(name)))
+            cur.execute(_create_index(settings, name, method, opclass, region_params, region=region))
+        built.append(region)
+    return built
+
+
+def region_index_name(settings: Settings, region: str) -> str:
+    return f"{settings.table_name}_embedding_{re.sub(r'[^a-z0-9]+', '_', region.lower())}_idx"
+
+
+def _create_index(
+    settings: Settings,
+    index_name: str,
+    method: str,
+    opclass: str,
+    params: Dict[str, int],
+    region: Optional[str] = None,
+) -> sql.Composed:
+    statement = sql.SQL("CREATE INDEX {index} ON {table} USING {method} (embedding {opclass}) WITH ({params})").format(
+        index=sql.Identifier(index_name),
+        table=sql.Identifier(settings.table_name),
+        method=sql.SQL(method),
+        opclass=sql.SQL(opclass),
+        params=sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.SQL(key), sql.Literal(value)) for key, value in params.items()
+        ),
+    )
+    if region is None:
+        return statement
+    # A literal (not a bound parameter) so the planner can match filtered queries to it.
+    return statement + sql.SQL(" WHERE region = {}").format(sql.Literal(region))
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's sizing guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def _index_fits(indexdef: str, method: str, opclass: str, params: Dict[str, int]) -> bool:
+    if f"USING {method}" not in indexdef or opclass not in indexdef:
+        return False
+    current = {key: int(value) for key, value in re.findall(r"(\w+)='?(\d+)'?", indexdef)}
+    if method == "ivfflat":
+        lists = current.get("lists", 0)
+        return params["lists"] / 2 <= lists <= params["lists"] * 2
+    return all(current.get(key) == value for key, value in params.items())
 
 
 def fetch_similar(
-    settings: Settings, query_embedding: List[float], limit: int = 3
-) -> List[Tuple[str, str, float]]:
-    """Return (title, content, distance) for the nearest documents."""
+    settings: Settings,
+    query_embedding: List[float],
+    limit: int = 3,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_text: Optional[str] = None,
+    filters: Optional[SearchFilter] = None,
+    with_embeddings: bool = False,
+) -> List[Tuple]:
+    """
+    Return (title, content, distance) for the nearest documents, plus the stored
+    embedding (a float32 array) as a fourth field with_embeddings=True.
+    `probes` (ivfflat) / `ef_search` (hnsw) override the configured recall knobs for this query.
+    With retrieval_mode "hybrid" and a query_text, full-text and vector candidates are
+    fused with reciprocal rank fusion in the same statement. `filters` restrict both
+    rankings to matching rows.
+    """
+    if query_text and settings.retrieval_mode == "hybrid":
+        candidates = max(limit, settings.hybrid_candidates)
+        query = _hybrid_query(settings, filters, with_embeddings)
+        params = [
+            query_embedding,
+            query_embedding,
+            candidates,
+            settings.text_search_config,
+            query_text,
+            candidates,
+            settings.rrf_k,
+            query_embedding,
+            limit,
+        ]
+    else:
+        query = _similarity_query(settings, filters, with_embeddings)
+        params = [query_embedding, query_embedding, limit]
+    # Knobs and query go out as one statement string: a single round trip, and the
+    # SET LOCAL stays scoped to the implicit transaction of that string.
+    with get_connection(settings) as conn, conn.cursor() as cur:
+        cur.execute(_search_knobs(settings, probes=probes, ef_search=ef_search) + query, params)
+        rows = cur.fetchall()
+    if with_embeddings:
+        rows = [(title, content, distance, _vector_array(embedding)) for title, content, distance, embedding in rows]
+    return rows
+
+
+def fetch_similar_many(
+    settings: Settings,
+    query_embeddings: Sequence[Sequence[float]],
+    limit: int = 3,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_texts: Optional[Sequence[str]] = None,
+    filters: Optional[SearchFilter] = None,
+    with_embeddings: bool = False,
+) -> List[List[Tuple]]:
+    """
+    fetch_similar for many queries in one statement: the embeddings are unnested
+    WITH ORDINALITY and each drives a LATERAL top-k subquery (an ANN index scan per
+    query). `filters` apply to every query. Returns one result list per query, in
+    input order.
+    """
+    if not query_embeddings:
+        return []
+    vectors = [np.asarray(embedding, dtype=np.float32) for embedding in query_embeddings]
+    if query_texts is not None and settings.retrieval_mode == "hybrid":
+        candidates = max(limit, settings.hybrid_candidates)
+        query = _hybrid_many_query(settings, filters, with_embeddings)
+        params = [
+            vectors,
+            list(query_texts),
+            settings.text_search_config,
+            settings.rrf_k,
+            candidates,
+            candidates,
+            limit,
+        ]
+    else:
+        query = _similarity_many_query(settings, filters, with_embeddings)
+        params = [vectors, limit]
+    results: List[List[Tuple]] = [[] for _ in vectors]
+    with get_connection(settings) as conn, conn.cursor() as cur:
+        cur.execute(_search_knobs(settings, probes=probes, ef_search=ef_search) + query, params)
+        for ordinal, *row in cur.fetchall():
+            if with_embeddings:
+                row[3] = _vector_array(row[3])
+            results[ordinal - 1].append(tuple(row))
+    return results
+
+
+def _vector_array(value) -> np.ndarray:
+    # pgvector's psycopg2 adapter returns numpy arrays in older releases, Vector objects in newer ones.
+    return np.asarray(value.to_numpy() if hasattr(value, "to_numpy") else value, dtype=np.float32)
+
+
+def _search_knobs(
+    settings: Settings, probes: Optional[int] = None, ef_search: Optional[int] = None
+) -> sql.Composed:
+    """Transaction-local ANN recall settings for the configured index type."""
+    if settings.index_type == "ivfflat":
+        knob, value = "ivfflat.probes", probes or settings.ivfflat_probes
+    else:
+        knob, value = "hnsw.ef_search", ef_search or settings.hnsw_ef_search
+    return sql.SQL("SET LOCAL {knob} = {value}; ").format(
+        knob=sql.SQL(knob), value=sql.Literal(int(value))
+    )
+
+
+def assert_index_scan(settings: Settings) -> str:
+    """
+    EXPLAIN the similarity query and raise if the planner cannot use the vector index.
+    Sequential scans are disabled for the check so small tables still report whether
+    the index is usable; a metric/opclass mismatch still yields a Seq Scan.
+    Returns the plan text.
+    """
+    index_name = f"{settings.table_name}_embedding_idx"
+    probe = [0.0] * settings.embed_dim
     with get_connection(settings) as conn, conn.cursor() as cur:
         cur.execute(
-            sql.SQL(
-                """
-                SELECT title, content, (embedding <-> %s::vector) AS distance
-                FROM {table}
-                ORDER BY embedding <-> %s::vector
+            sql.SQL("SET LOCAL enable_seqscan = off; EXPLAIN ") + _similarity_query(settings),
+            [probe, probe, 3],
+        )
+        plan = "\n".join(row[0] for row in cur.fetchall())
+    if "Index Scan" not in plan or index_name not in plan:
+        raise RuntimeError(
+            f"Similarity search on {settings.table_name} is not using {index_name} "
+            f"(distance_metric={settings.distance_metric}). Plan:\n{plan}"
+        )
+    return plan
+
+
+def distance_metric(settings: Settings) -> Tuple[str, str]:
+    """Return (index operator class, distance operator) for the configured metric."""
+    try:
+        return DISTANCE_METRICS[settings.distance_metric]
+    except KeyError:
+        raise ValueError(
+            f"Unknown distance_metric {settings.distance_metric!r}; "
+            f"expected one of: {', '.join(DISTANCE_METRICS)}"
+        ) from None
+
+
+class _ParamLiteral(sql.Literal):
+    """A literal inlined into a query that is also executed with %s parameters."""
+
+    def as_string(self, context) -> str:
+        return super().as_string(context).replace("%", "%%")
+
+
+def _filter_sql(filters: Optional[SearchFilter], keyword: str = "WHERE") -> sql.Composable:
+    """
+    `WHERE <predicate>` (or `AND ...`) for a SearchFilter, empty when it is unset.
+    Values are inlined as literals so a filter on one region can be proven to match a
+    partial index's `WHERE region = '<region>'` predicate; `%` in them is doubled,
+    since every search query also takes %s parameters.
+    """
+    if not filters:
+        return sql.SQL("")
+    conditions = []
+    for column, values in (("region", filters.regions), ("source", filters.sources)):
+        if len(values) == 1:
+            conditions.append(sql.SQL("{} = {}").format(sql.Identifier(column), _ParamLiteral(values[0])))
+        elif values:
+            conditions.append(
+                sql.SQL("{} IN ({})").format(
+                    sql.Identifier(column), sql.SQL(", ").join(map(_ParamLiteral, values))
+                )
+            )
+    if filters.tags:
+        conditions.append(sql.SQL("tags @> {}::text[]").format(_ParamLiteral(list(filters.tags))))
+    return sql.SQL(f" {keyword} ") + sql.SQL(" AND ").join(conditions)
+
+
+def _similarity_query(
+    settings: Settings, filters: Optional[SearchFilter] = None, with_embeddings: bool = False
+) -> sql.Composed:
+    _, operator = distance_metric(settings)
+    return sql.SQL(
+        """
+        SELECT title, content, (embedding {op} %s::vector) AS distance{stored}
+        FROM {table}{where}
+        ORDER BY embedding {op} %s::vector
+        LIMIT %s
+        """
+    ).format(
+        table=sql.Identifier(settings.table_name),
+        op=sql.SQL(operator),
+        where=_filter_sql(filters),
+        stored=sql.SQL(", embedding" if with_embeddings else ""),
+    )
+
+
+def _hybrid_query(
+    settings: Settings, filters: Optional[SearchFilter] = None, with_embeddings: bool = False
+) -> sql.Composed:
+    """
+    Vector and full-text rankings fused with RRF: score = sum(1 / (rrf_k + rank)).
+
+    The vector CTE is the plain ORDER BY ... LIMIT so the ANN index is used. Query terms
+    are OR-ed (plainto_tsquery ANDs them, which drops most natural-language questions)
+    and ranked with ts_rank_cd, length-normalized.
+    """
+    _, operator = distance_metric(settings)
+    return sql.SQL(
+        """
+        WITH vector_hits AS (
+            SELECT id, row_number() OVER (ORDER BY distance) AS rank
+            FROM (
+                SELECT id, embedding {op} %s::vector AS distance
+                FROM {table}{where}
+                ORDER BY embedding {op} %s::vector
                 LIMIT %s
-                """
-            ).format(table=sql.Identifier(settings.table_name)),
-            [query_embedding, query_embedding, limit],
+            ) nearest
+        ),
+        text_query AS (
+            SELECT replace(plainto_tsquery(%s::regconfig, %s)::text, ' & ', ' | ')::tsquery AS query
+        ),
+        text_hits AS (
+            SELECT id, row_number() OVER (ORDER BY ts_rank_cd(search_tsv, query, 1) DESC, id) AS rank
+            FROM {table}, text_query
+            WHERE search_tsv @@ query{and_filter}
+            ORDER BY rank
+            LIMIT %s
+        ),
+        fused AS (
+            SELECT id, sum(1.0 / (%s + rank)) AS score
+            FROM (SELECT id, rank FROM vector_hits UNION ALL SELECT id, rank FROM text_hits) hits
+            GROUP BY id
         )
-        return cur.fetchall()
+        SELECT doc.title, doc.content, (doc.embedding {op} %s::vector) AS distance{stored}
+        FROM fused JOIN {table} doc USING (id)
+        ORDER BY fused.score DESC, distance
+        LIMIT %s
+        """
+    ).format(
+        table=sql.Identifier(settings.table_name),
+        op=sql.SQL(operator),
+        where=_filter_sql(filters),
+        and_filter=_filter_sql(filters, "AND"),
+        stored=sql.SQL(", doc.embedding" if with_embeddings else ""),
+    )
+
+
+def _similarity_many_query(
+    settings: Settings, filters: Optional[SearchFilter] = None, with_embeddings: bool = False
+) -> sql.Composed:
+    _, operator = distance_metric(settings)
+    return sql.SQL(
+        """
+        SELECT q.ordinal, hit.title, hit.content, hit.distance{hit_stored}
+        FROM unnest(%s::vector[]) WITH ORDINALITY AS q (embedding, ordinal)
+        CROSS JOIN LATERAL (
+            SELECT title, content, (embedding {op} q.embedding) AS distance{stored}
+            FROM {table}{where}
+            ORDER BY embedding {op} q.embedding
+            LIMIT %s
+        ) hit
+        ORDER BY q.ordinal, hit.distance
+        """
+    ).format(
+        table=sql.Identifier(settings.table_name),
+        op=sql.SQL(operator),
+        where=_filter_sql(filters),
+        stored=sql.SQL(", embedding" if with_embeddings else ""),
+        hit_stored=sql.SQL(", hit.embedding" if with_embeddings else ""),
+    )
+
+
+def _hybrid_many_query(
+    settings: Settings, filters: Optional[SearchFilter] = None, with_embeddings: bool = False
+) -> sql.Composed:
+    """_hybrid_query per unnested (embedding, question) pair, via LATERAL subqueries."""
+    _, operator = distance_metric(settings)
+    return sql.SQL(
+        """
+        SELECT q.ordinal, hit.title, hit.content, hit.distance{hit_stored}
+        FROM unnest(%s::vector[], %s::text[]) WITH ORDINALITY AS q (embedding, question, ordinal)
+        CROSS JOIN LATERAL (
+            SELECT replace(plainto_tsquery(%s::regconfig, q.question)::text, ' & ', ' | ')::tsquery AS query
+        ) tq
+        CROSS JOIN LATERAL (
+            SELECT doc.title, doc.content, (doc.embedding {op} q.embedding) AS distance, fused.score{stored}
+            FROM (
+                SELECT id, sum(1.0 / (%s + rank)) AS score
+                FROM (
+                    SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                    FROM (
+                        SELECT id, embedding {op} q.embedding AS distance
+                        FROM {table}{where}
+                        ORDER BY embedding {op} q.embedding
+                        LIMIT %s
+                    ) nearest
+                    UNION ALL
+                    (
+                        SELECT id, row_number() OVER (ORDER BY ts_rank_cd(search_tsv, tq.query, 1) DESC, id) AS rank
+                        FROM {table}
+                        WHERE search_tsv @@ tq.query{and_filter}
+                        ORDER BY rank
+                        LIMIT %s
+                    )
+                ) hits
+                GROUP BY id
+            ) fused
+            JOIN {table} doc USING (id)
+            ORDER BY fused.score DESC, distance
+            LIMIT %s
+        ) hit
+        ORDER BY q.ordinal, hit.score DESC, hit.distance
+        """
+    ).format(
+        table=sql.Identifier(settings.table_name),
+        op=sql.SQL(operator),
+        where=_filter_sql(filters),
+        and_filter=_filter_sql(filters, "AND"),
+        stored=sql.SQL(", doc.embedding" if with_embeddings else ""),
+        hit_stored=sql.SQL(", hit.embedding" if with_embeddings else ""),
+    )
@@ -0,0 +1,199 @@
+"""
+Content-addressed on-disk embedding cache shared by every project in the workspace.
+
+Vectors live as float32 rows in a memory-mapped file (one file per model/dimension
+pair). A small SQLite index maps sha256(model, dimensions, text) to a row slot and
+tracks last use, so the cache can be capped in size with LRU eviction. An advisory
+file lock serializes readers and writers, which keeps the cache safe to share
+between processes (e.g. two CLIs ingesting at once).
+"""
+
+import fcntl
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import Settings
+
+_SQLITE_MAX_VARS = 500
+
+
+class EmbeddingCache:
+    """Persistent (model, dimensions, text) -> vector store with an LRU size cap."""
+
+    def __init__(self, root: Path, model: str, dimensions: int, max_bytes: int):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_slots = max(1, max_bytes // (dimensions * 4))
+        self.directory = Path(root) / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}-{dimensions}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._lock_path = self.directory / "cache.lock"
+        self._thread_lock = threading.Lock()
+        self._index = sqlite3.connect(
+            self.directory / "index.sqlite",
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        with self._locked():
+            self._index.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    slot INTEGER UNIQUE NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._index.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.model, str(self.dimensions), text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors in input order, with None for misses."""
+        keys = [self.key(text) for text in texts]
+        with self._locked():
+            slots = self._lookup(keys)
+            results: List[Optional[List[float]]] = [None] * len(keys)
+            if slots:
+                vectors = self._open_vectors("r")
+                for idx, key in enumerate(keys):
+                    slot = slots.get(key)
+                    if slot is not None and vectors is not None and slot < len(vectors):
+                        results[idx] = vectors[slot].tolist()
+                del vectors
+                self._touch(list(slots))
+        found = sum(vec is not None for vec in results)
+        self.hits += found
+        self.misses += len(results) - found
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store vectors for texts, evicting least-recently-used entries when full."""
+        pending: Dict[str, Sequence[float]] = {}
+        for text, vector in zip(texts, vectors):
+            pending[self.key(text)] = vector
+        if not pending:
+            return
+        items = list(pending.items())[-self.max_slots :]
+        with self._locked():
+            existing = self._lookup([key for key, _ in items])
+            # Refresh entries being rewritten so eviction never picks them.
+            self._touch(list(existing))
+            fresh = [key for key, _ in items if key not in existing]
+            slots = dict(existing)
+            slots.update(zip(fresh, self._allocate(len(fresh))))
+
+            needed = max(slots.values()) + 1
+            self._grow(needed)
+            store = self._open_vectors("r+")
+            for key, vector in items:
+                store[slots[key]] = np.asarray(vector, dtype=np.float32)
+            store.flush()
+            del store
+
+            now = time.time()
+            self._index.execute("BEGIN")
+            self._index.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slots[key], now) for key, _ in items],
+            )
+            self._index.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self._locked():
+            return self._index.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(keys), _SQLITE_MAX_VARS):
+            batch = keys[start : start + _SQLITE_MAX_VARS]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                self._index.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            )
+        return found
+
+    def _touch(self, keys: List[str]) -> None:
+        now = time.time()
+        self._index.execute("BEGIN")
+        self._index.executemany(
+            "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in keys]
+        )
+        self._index.execute("COMMIT")
+
+    def _allocate(self, count: int) -> List[int]:
+        """Return `count` free slots, reusing the least-recently-used ones once full."""
+        if count == 0:
+            return []
+        next_slot = self._index.execute("SELECT COALESCE(MAX(slot), -1) + 1 FROM entries").fetchone()[0]
+        free = max(0, min(count, self.max_slots - next_slot))
+        slots = list(range(next_slot, next_slot + free))
+        shortfall = count - free
+        if shortfall:
+            victims: List[Tuple[str, int]] = self._index.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", [shortfall]
+            ).fetchall()
+            self._index.execute("BEGIN")
+            self._index.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            self._index.execute("COMMIT")
+            slots.extend(slot for _, slot in victims)
+        return slots
+
+    def _grow(self, slots: int) -> None:
+        size = slots * self.dimensions * 4
+        if not self._vectors_path.exists() or self._vectors_path.stat().st_size < size:
+            with open(self._vectors_path, "ab") as handle:
+                handle.truncate(size)
+
+    def _open_vectors(self, mode: str) -> Optional[np.memmap]:
+        if not self._vectors_path.exists():
+            return None
+        rows = self._vectors_path.stat().st_size // (self.dimensions * 4)
+        if rows == 0:
+            return None
+        return np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(rows, self.dimensions))
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_CACHES: Dict[Tuple[str, str, int], EmbeddingCache] = {}
+
+
+def get_embedding_cache(settings: Settings) -> Optional[EmbeddingCache]:
+    """Return the process-wide cache for the configured model, or None if disabled."""
+    if settings.embed_cache_dir is None or settings.embed_cache_max_mb <= 0:
+        return None
+    key = (str(settings.embed_cache_dir), settings.embed_model, settings.embed_dim)
+    if key not in _CACHES:
+        _CACHES[key] = EmbeddingCache(
+            settings.embed_cache_dir,
+            model=settings.embed_model,
+            dimensions=settings.embed_dim,
+            max_bytes=settings.embed_cache_max_mb * 1024 * 1024,
+        )
+    return _CACHES[key]
@@ -0,0 +1,52 @@
+"""
+Metadata filters for retrieval.
+
+Ingest stores each chunk's source file, region and tags (see
+src/data_loader.parse_metadata). A SearchFilter restricts a search to matching
+chunks: pgvector pushes it into the SQL WHERE clause (so a per-region partial ANN
+index can serve it, see Settings.partial_index_regions); the in-process backends
+search only the matching rows.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Tuple
+
+
+def _as_tuple(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    if values is None:
+        return ()
+    if isinstance(values, str):
+        return (values,)
+    return tuple(values)
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Chunks whose region is one of `regions`, whose source is one of `sources`, and
+    that carry every tag in `tags`. Empty fields do not filter.
+    """
+
+    regions: Tuple[str, ...] = ()
+    sources: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+
+    @classmethod
+    def of(
+        cls,
+        region: Optional[Iterable[str]] = None,
+        source: Optional[Iterable[str]] = None,
+        tags: Optional[Iterable[str]] = None,
+    ) -> "SearchFilter":
+        """Build a filter from single values or lists: SearchFilter.of(region="asia")."""
+        return cls(regions=_as_tuple(region), sources=_as_tuple(source), tags=_as_tuple(tags))
+
+    def __bool__(self) -> bool:
+        return bool(self.regions or self.sources or self.tags)
+
+    def matches(self, source: Optional[str], region: Optional[str], tags: Sequence[str]) -> bool:
+        if self.regions and region not in self.regions:
+            return False
+        if self.sources and source not in self.sources:
+            return False
+        return all(tag in tags for tag in self.tags)
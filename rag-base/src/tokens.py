@@ -0,0 +1,48 @@
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional: counts fall back to the character estimate
+    tiktoken = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str) -> Optional[Any]:
+    """tiktoken encoding for a model, loaded once; None if tiktoken or its BPE file is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:  # model newer than this tiktoken release
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:  # the BPE file is downloaded on first use and may be unreachable
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str, model: str) -> int:
+    """Exact token count with tiktoken when available, else estimate_tokens(); memoized."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, limit: int, model: str) -> str:
+    """The longest prefix of text within `limit` tokens (cut at a word boundary when estimating)."""
+    if limit <= 0:
+        return ""
+    if count_tokens(text, model) <= limit:
+        return text
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:limit])
+    cut = text[: max(0, (limit - 1) * 4)]
+    return cut.rsplit(" ", 1)[0] if " " in cut else cut
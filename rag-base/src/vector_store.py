@@ -0,0 +1,578 @@
+"""
+Vector storage backends behind one interface, selected with Settings.vector_backend.
+
+- pgvector (default): PostgreSQL + pgvector through src/db.py.
+- numpy: an in-process float32 matrix memory-mapped from disk, with exact top-k via
+  argpartition. For small corpora this keeps the database off the query path
+  entirely (sub-millisecond retrieval for a few thousand chunks).
+- hnsw: the numpy matrix plus a persistent HNSW graph (src/hnsw.py) for corpora too
+  large to scan on every query.
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src import db
+from src.config import Settings
+from src.filters import SearchFilter
+from src.hnsw import HNSWIndex
+from src.lexical import BM25Index, reciprocal_rank_fusion
+
+# (title, content, embedding, content_hash, source, region, tags)
+Row = Tuple[str, str, List[float], str, Optional[str], Optional[str], Tuple[str, ...]]
+Match = Tuple[str, str, float]  # (title, content, distance)
+EmbeddedMatch = Tuple[str, str, float, np.ndarray]  # Match plus the stored embedding
+
+_DISTANCE_BLOCK = 32_000_000  # float32 elements per batched distance computation
+
+
+class VectorStore(ABC):
+    """Storage and nearest-neighbour search for embedded document chunks."""
+
+    @abstractmethod
+    def ensure_schema(self) -> None:
+        ...
+
+    @abstractmethod
+    def content_hashes(self) -> Dict[str, Optional[str]]:
+        ...
+
+    @abstractmethod
+    def upsert(self, documents: Iterable[Row]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, titles: Iterable[str]) -> int:
+        ...
+
+    @abstractmethod
+    def build_index(self, force: bool = False) -> str:
+        """Finish a load: build/refresh whatever search structure the backend uses."""
+
+    def check_index(self) -> None:
+        """Raise if similarity search would not use the backend's index."""
+
+    @abstractmethod
+    def fetch_similar(
+        self,
+        query_embedding: Sequence[float],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[Match]:
+        """
+        Nearest rows as (title, content, distance). With retrieval_mode "hybrid" and a
+        query_text, keyword and vector rankings are fused with RRF before the cut.
+        With `filters`, only rows matching the metadata filter are searched. With
+        with_embeddings=True each row is an EmbeddedMatch carrying its stored vector
+        (L2-normalized for cosine on the in-process backends).
+        """
+
+    def fetch_similar_many(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_texts: Optional[Sequence[str]] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[List[Match]]:
+        """fetch_similar for a batch of queries, one result list per query in input order."""
+        texts: Sequence[Optional[str]] = query_texts if query_texts is not None else [None] * len(query_embeddings)
+        return [
+            self.fetch_similar(
+                embedding,
+                limit=limit,
+                probes=probes,
+                ef_search=ef_search,
+                query_text=text,
+                filters=filters,
+                with_embeddings=with_embeddings,
+            )
+            for embedding, text in zip(query_embeddings, texts)
+        ]
+
+    def close(self) -> None:
+        pass
+
+
+class PgVectorStore(VectorStore):
+    """
+    PostgreSQL + pgvector. Each call borrows a connection from the process-wide pool
+    and returns it, so there is nothing to close per store: other pipelines and the
+    ingest writer share the pool, which is closed at exit (db.close_pools).
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.pool = db.get_pool(settings)
+
+    def ensure_schema(self) -> None:
+        db.ensure_schema(self.settings)
+
+    def content_hashes(self) -> Dict[str, Optional[str]]:
+        return db.fetch_content_hashes(self.settings)
+
+    def upsert(self, documents: Iterable[Row]) -> None:
+        db.upsert_documents(self.settings, documents)
+
+    def delete(self, titles: Iterable[str]) -> int:
+        return db.delete_documents(self.settings, titles)
+
+    def build_index(self, force: bool = False) -> str:
+        return db.build_index(self.settings, force=force)
+
+    def check_index(self) -> None:
+        db.assert_index_scan(self.settings)
+
+    def fetch_similar(
+        self,
+        query_embedding: Sequence[float],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[Match]:
+        return db.fetch_similar(
+            self.settings,
+            query_embedding,
+            limit=limit,
+            probes=probes,
+            ef_search=ef_search,
+            query_text=query_text,
+            filters=filters,
+            with_embeddings=with_embeddings,
+        )
+
+    def fetch_similar_many(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_texts: Optional[Sequence[str]] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[List[Match]]:
+        return db.fetch_similar_many(
+            self.settings,
+            query_embeddings,
+            limit=limit,
+            probes=probes,
+            ef_search=ef_search,
+            query_texts=query_texts,
+            filters=filters,
+            with_embeddings=with_embeddings,
+        )
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact search over an (n, dim) float32 matrix kept next to a JSON sidecar.
+
+    The matrix is saved as .npy and memory-mapped on load; for the cosine metric rows
+    are L2-normalized at write time so a query is one matrix-vector product plus
+    argpartition. Writes are applied in memory and persisted atomically by
+    build_index(), which ingest calls once at the end of a load. Filtered searches
+    compute distances for the matching rows only.
+    """
+
+    def __init__(self, settings: Settings):
+        db.distance_metric(settings)  # validate the metric name
+        self.settings = settings
+        self.directory = Path(settings.vector_store_dir) / settings.table_name
+        self._matrix_path = self.directory / "embeddings.npy"
+        self._meta_path = self.directory / "documents.json"
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+        self._titles: List[str] = []
+        self._contents: List[str] = []
+        self._hashes: List[Optional[str]] = []
+        self._sources: List[Optional[str]] = []
+        self._regions: List[Optional[str]] = []
+        self._tags: List[Tuple[str, ...]] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix: np.ndarray = np.empty((0, settings.embed_dim), dtype=np.float32)
+        self._keywords: Optional[BM25Index] = None
+        self._subsets: Dict[SearchFilter, np.ndarray] = {}
+
+    def ensure_schema(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def content_hashes(self) -> Dict[str, Optional[str]]:
+        self._load()
+        return dict(zip(self._titles, self._hashes))
+
+    def upsert(self, documents: Iterable[Row]) -> None:
+        self._load()
+        with self._lock:
+            appended: List[np.ndarray] = []
+            for title, content, embedding, digest, source, region, tags in documents:
+                vector = self._prepare(embedding)
+                pos = self._positions.get(title)
+                if pos is None:
+                    self._positions[title] = len(self._titles)
+                    self._titles.append(title)
+                    self._contents.append(content)
+                    self._hashes.append(digest)
+                    self._sources.append(source)
+                    self._regions.append(region)
+                    self._tags.append(tuple(tags))
+                    appended.append(vector)
+                    continue
+                if not self._matrix.flags.writeable:
+                    self._matrix = np.array(self._matrix)
+                self._matrix[pos] = vector
+                self._contents[pos] = content
+                self._hashes[pos] = digest
+                self._sources[pos] = source
+                self._regions[pos] = region
+                self._tags[pos] = tuple(tags)
+            if appended:
+                self._matrix = np.vstack([self._matrix, np.stack(appended)])
+            self._dirty = True
+            self._keywords = None
+            self._subsets = {}
+
+    def delete(self, titles: Iterable[str]) -> int:
+        self._load()
+        doomed = {title for title in titles if title in self._positions}
+        if not doomed:
+            return 0
+        with self._lock:
+            keep = [pos for pos, title in enumerate(self._titles) if title not in doomed]
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self._titles = [self._titles[pos] for pos in keep]
+            self._contents = [self._contents[pos] for pos in keep]
+            self._hashes = [self._hashes[pos] for pos in keep]
+            self._sources = [self._sources[pos] for pos in keep]
+            self._regions = [self._regions[pos] for pos in keep]
+            self._tags = [self._tags[pos] for pos in keep]
+            self._positions = {title: pos for pos, title in enumerate(self._titles)}
+            self._dirty = True
+            self._keywords = None
+            self._subsets = {}
+        return len(doomed)
+
+    def build_index(self, force: bool = False) -> str:
+        self._load()
+        with self._lock:
+            if self._dirty or force:
+                self._persist()
+            return f"numpy exact search ({len(self._titles)} rows)"
+
+    def fetch_similar(
+        self,
+        query_embedding: Sequence[float],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[Match]:
+        return self.fetch_similar_many(
+            [query_embedding],
+            limit=limit,
+            ef_search=ef_search,
+            query_texts=None if query_text is None else [query_text],
+            filters=filters,
+            with_embeddings=with_embeddings,
+        )[0]
+
+    def fetch_similar_many(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        limit: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_texts: Optional[Sequence[str]] = None,
+        filters: Optional[SearchFilter] = None,
+        with_embeddings: bool = False,
+    ) -> List[List[Match]]:
+        self._load()
+        if not len(query_embeddings):
+            return []
+        queries = np.stack([self._prepare(embedding) for embedding in query_embeddings])
+        hybrid = query_texts is not None and self.settings.retrieval_mode == "hybrid"
+        pool = max(limit, self.settings.hybrid_candidates) if hybrid else limit
+        results: List[List[Match]] = []
+        with self._lock:
+            subset = self._subset(filters) if filters else None
+            if subset is None:
+                nearest = self._nearest_many(queries, pool, ef_search)
+            else:
+                nearest = self._exact_many(queries, pool, subset)
+            for pos, (ids, distances) in enumerate(nearest):
+                if hybrid and query_texts[pos]:
+                    keyword = self._keyword_index().search(query_texts[pos], pool, allowed=subset)
+                    fused = reciprocal_rank_fusion([ids.tolist(), keyword], k=self.settings.rrf_k)
+                    ids = np.array(fused[:limit], dtype=np.int64)
+                    distances = self._distances(self._matrix[ids], queries[pos])
+                rows: List[Match] = [
+                    (self._titles[i], self._contents[i], float(dist))
+                    for i, dist in zip(ids[:limit].tolist(), distances[:limit].tolist())
+                ]
+                if with_embeddings:
+                    rows = [row + (np.array(self._matrix[i]),) for row, i in zip(rows, ids[:limit].tolist())]
+                results.append(rows)
+        return results
+
+    def _nearest_many(
+        self, queries: np.ndarray, limit: int, ef_search: Optional[int] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Positions and distances of the `limit` closest rows per query, closest first."""
+        return self._exact_many(queries, limit)
+
+    def _exact_many(
+        self, queries: np.ndarray, limit: int, subset: Optional[np.ndarray] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact top-`limit` per query over all rows, or only the row positions in `subset`."""
+        rows = self._matrix if subset is None else self._matrix[subset]
+        count = min(limit, len(rows))
+        if count <= 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))] * len(queries)
+        results: List[Tuple[np.ndarray, np.ndarray]] = []
+        # Bound the (queries x rows) distance block to ~128 MB of float32.
+        step = max(1, _DISTANCE_BLOCK // len(rows))
+        for start in range(0, len(queries), step):
+            distances = self._distances(rows, queries[start : start + step]).T
+            top = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            top_distances = np.take_along_axis(distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1)
+            ids = np.take_along_axis(top, order, axis=1)
+            results.extend(
+                zip(ids if subset is None else subset[ids], np.take_along_axis(top_distances, order, axis=1))
+            )
+        return results
+
+    def _subset(self, filters: SearchFilter) -> np.ndarray:
+        """Positions of rows matching a filter, memoized until the next write."""
+        positions = self._subsets.get(filters)
+        if positions is None:
+            positions = np.array(
+                [
+                    pos
+                    for pos, (source, region, tags) in enumerate(zip(self._sources, self._regions, self._tags))
+                    if filters.matches(source, region, tags)
+                ],
+                dtype=np.int64,
+            )
+            self._subsets[filters] = positions
+        return positions
+
+    def _keyword_index(self) -> BM25Index:
+        """BM25 over title + content, rebuilt lazily after writes."""
+        if self._keywords is None:
+            self._keywords = BM25Index(
+                [f"{title} {content}" for title, content in zip(self._titles, self._contents)]
+            )
+        return self._keywords
+
+    def _distances(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Row distances to one query (n,), or to a (q, dim) batch as an (n, q) array."""
+        products = matrix @ query.T
+        metric = self.settings.distance_metric
+        if metric == "cosine":
+            return 1.0 - products
+        if metric == "inner_product":
+            return -products
+        rows = np.einsum("ij,ij->i", matrix, matrix)
+        if products.ndim == 2:
+            rows = rows[:, None]
+        sq = rows - 2.0 * products + np.einsum("...j,...j->...", query, query)
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def _prepare(self, embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.settings.embed_dim,):
+            raise ValueError(
+                f"Expected a {self.settings.embed_dim}-dimensional embedding, got shape {vector.shape}"
+            )
+        if self.settings.distance_metric == "cosine":
+            norm = float(np.linalg.norm(vector))
+            if norm > 0:
+                vector = vector / norm
+        return vector
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            meta = None
+            if self._meta_path.exists() and self._matrix_path.exists():
+                meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            # Rows are stored pre-normalized for cosine; another metric means a reload.
+            if meta and meta.get("metric") == self.settings.distance_metric:
+                self._titles = meta["titles"]
+                self._contents = meta["contents"]
+                self._hashes = meta["hashes"]
+                # Stores written before metadata columns existed have none until re-ingest.
+                self._sources = meta.get("sources", [None] * len(self._titles))
+                self._regions = meta.get("regions", [None] * len(self._titles))
+                self._tags = [tuple(tags) for tags in meta.get("tags", [()] * len(self._titles))]
+                self._positions = {title: pos for pos, title in enumerate(self._titles)}
+                self._matrix = np.load(self._matrix_path, mmap_mode="r")
+            self._loaded = True
+
+    def _persist(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self._matrix_path.with_suffix(".tmp.npy")
+        tmp_meta = self._meta_path.with_suffix(".tmp")
+        np.save(tmp_matrix, np.ascontiguousarray(self._matrix, dtype=np.float32))
+        tmp_meta.write_text(
+            json.dumps(
+                {
+                    "metric": self.settings.distance_metric,
+                    "titles": self._titles,
+                    "contents": self._contents,
+                    "hashes": self._hashes,
+                    "sources": self._sources,
+                    "regions": self._regions,
+                    "tags": self._tags,
+                }
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp_matrix, self._matrix_path)
+        os.replace(tmp_meta, self._meta_path)
+        self._matrix = np.load(self._matrix_path, mmap_mode="r")
+        self._dirty = False
+
+
+class HNSWVectorStore(NumpyVectorStore):
+    """
+    NumpyVectorStore with an HNSW graph over its rows, saved under hnsw/.
+
+    New rows are inserted into the graph incrementally by build_index(); overwritten
+    rows are relinked and deleted rows are dropped in place, until those edits pass
+    `hnsw_rebuild_fraction` of the rows and build_index() rebuilds the graph. Until the
+    graph covers every row (or if it is missing) queries fall back to exact search, and
+    filtered queries always search just the matching rows exactly.
+    """
+
+    def __init__(self, settings: Settings):
+        super().__init__(settings)
+        self._graph_dir = self.directory / "hnsw"
+        self._graph: Optional[HNSWIndex] = None
+        self._relink: Set[str] = set()
+
+    def upsert(self, documents: Iterable[Row]) -> None:
+        documents = list(documents)
+        self._load()
+        with self._lock:
+            self._relink.update(title for title, *_ in documents if title in self._positions)
+            super().upsert(documents)
+
+    def delete(self, titles: Iterable[str]) -> int:
+        self._load()
+        with self._lock:
+            before = list(self._titles)
+            removed = super().delete(titles)
+            if removed and self._graph is not None:
+                kept = set(self._titles)
+                self._graph.compact(np.array([title in kept for title in before]), self._matrix)
+            return removed
+
+    def build_index(self, force: bool = False) -> str:
+        self._load()
+        with self._lock:
+            graph = None if force else self._graph
+            if graph is not None:
+                pending = graph.edits + len(self._relink)
+                if pending > self.settings.hnsw_rebuild_fraction * len(graph):
+                    graph = None  # in-place edits erode recall; start over from the rows
+            if graph is None:
+                graph = self._new_graph()
+            graph.vectors = self._matrix
+            relinked = 0
+            for title in self._relink:
+                pos = self._positions.get(title)
+                if pos is not None and pos < len(graph):
+                    graph.relink(pos)
+                    relinked += 1
+            self._relink.clear()
+            added = graph.extend(self._matrix)
+            self._graph = graph
+            if force or self._dirty or added or relinked:
+                self._persist()
+            return (
+                f"hnsw (m={graph.m}, ef_construction={graph.ef_construction}, "
+                f"{len(graph)} rows, {added} inserted)"
+            )
+
+    def check_index(self) -> None:
+        self._load()
+        with self._lock:
+            indexed = len(self._graph) if self._graph is not None else 0
+            if indexed != len(self._titles):
+                raise RuntimeError(
+                    f"HNSW graph covers {indexed} of {len(self._titles)} rows; run reindex to rebuild it."
+                )
+
+    def _nearest_many(
+        self, queries: np.ndarray, limit: int, ef_search: Optional[int] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        graph = self._graph
+        if graph is None or len(graph) != len(self._titles):
+            return self._exact_many(queries, limit)
+        graph.vectors = self._matrix
+        ef = ef_search or self.settings.hnsw_ef_search
+        return [graph.search(query, limit, ef=ef) for query in queries]
+
+    def _new_graph(self) -> HNSWIndex:
+        return HNSWIndex(
+            self._matrix,
+            metric=self.settings.distance_metric,
+            m=self.settings.hnsw_m,
+            ef_construction=self.settings.hnsw_ef_construction,
+        )
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            super()._load()
+            graph = HNSWIndex.load(self._graph_dir, self._matrix) if self._titles else None
+            if graph is not None and graph.metric == self.settings.distance_metric:
+                self._graph = graph
+
+    def _persist(self) -> None:
+        super()._persist()
+        if self._graph is not None:
+            self._graph.vectors = self._matrix
+            self._graph.save(self._graph_dir)
+
+
+BACKENDS = {
+    "pgvector": PgVectorStore,
+    "numpy": NumpyVectorStore,
+    "hnsw": HNSWVectorStore,
+}
+
+
+def get_vector_store(settings: Settings) -> VectorStore:
+    """Build the store for the configured backend."""
+    backend = BACKENDS.get(settings.vector_backend)
+    if backend is None:
+        raise ValueError(
+            f"Unknown vector_backend {settings.vector_backend!r}; expected one of: {', '.join(BACKENDS)}"
+        )
+    return backend(settings)
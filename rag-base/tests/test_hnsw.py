@@ -0,0 +1,48 @@
+"""Recall of an HNSW graph edited in place, against a graph built fresh on the same rows."""
+
+import numpy as np
+
+from src.hnsw import HNSWIndex, evaluate_recall
+
+ROWS, DIM, K, EF = 1500, 64, 10, 40
+CENTERS = np.random.default_rng(0).normal(size=(20, DIM))
+
+
+def _vectors(rows: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors; rows drawn with different seeds share the clusters."""
+    rng = np.random.default_rng(seed)
+    vectors = CENTERS[rng.integers(0, len(CENTERS), size=rows)] + 3.0 * rng.normal(size=(rows, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _build(vectors: np.ndarray) -> HNSWIndex:
+    index = HNSWIndex(vectors, m=8, ef_construction=40)
+    index.extend()
+    return index
+
+
+def _recall(index: HNSWIndex, queries: np.ndarray) -> float:
+    return evaluate_recall(index, queries, K, [EF])[0]["recall"]
+
+
+def test_recall_after_delete_matches_fresh_build():
+    vectors, queries = _vectors(ROWS, 1), _vectors(200, 2)
+    keep = np.random.default_rng(3).random(ROWS) >= 0.3
+    index = _build(vectors)
+    index.compact(keep, vectors[keep])
+
+    assert len(index) == int(keep.sum())
+    assert index.edits == ROWS - int(keep.sum())
+    assert _recall(index, queries) >= _recall(_build(vectors[keep]), queries) - 0.02
+
+
+def test_recall_after_overwrite_matches_fresh_build():
+    vectors, queries = _vectors(ROWS, 1), _vectors(200, 2)
+    index = _build(vectors)
+    moved = np.random.default_rng(3).choice(ROWS, size=ROWS // 5, replace=False)
+    vectors[moved] = _vectors(len(moved), 4)
+    for node in moved.tolist():
+        index.relink(node)
+
+    assert index.edits == len(moved)
+    assert _recall(index, queries) >= _recall(_build(vectors), queries) - 0.02
@@ -0,0 +1,183 @@
+"""
+Semantic answer cache for RAGPipeline.answer.
+
+Each entry stores the question embedding, the ids (titles) of the chunks it was
+answered from, and the answer. A new question hits when its embedding is within
+`answer_cache_threshold` cosine similarity of a stored one, retrieval returned the
+same chunks, and the corpus version is unchanged; the chat completion is skipped.
+
+Entries live in SQLite so they survive restarts and are shared by processes of the
+same project. Re-ingesting changed documents starts a new corpus version by dropping
+every entry. The in-memory similarity matrix is reloaded whenever SQLite reports
+that another connection changed the file.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import Settings
+
+
+class AnswerCache:
+    """(question embedding, chunk ids) -> answer, with LRU/TTL eviction."""
+
+    def __init__(self, path: Path, threshold: float, max_entries: int, ttl_s: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_lru ON answers (last_used)")
+        self._lock = threading.Lock()
+        self._data_version: Optional[Tuple[int, int]] = None
+        self._ids: List[int] = []
+        self._keys: List[Tuple[str, str]] = []  # (namespace, chunk_ids)
+        self._created: np.ndarray = np.zeros(0)
+        self._matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding: Sequence[float], chunk_ids: Sequence[str], namespace: str) -> Optional[str]:
+        """
+        Return a stored answer for a close-enough question over the same chunks.
+        `namespace` separates answers that differ for the same chunks (model, route).
+        """
+        query = _unit(embedding)
+        key = (namespace, json.dumps(sorted(chunk_ids)))
+        with self._lock:
+            self._refresh()
+            if len(self._ids) and self._matrix.shape[1] == len(query):
+                similarity = self._matrix @ query
+                fresh = self._created > time.time() - self.ttl_s
+                for pos in np.argsort(-similarity):
+                    if similarity[pos] < self.threshold:
+                        break
+                    if fresh[pos] and self._keys[pos] == key:
+                        row = self._db.execute(
+                            "SELECT answer FROM answers WHERE id = ?", [self._ids[pos]]
+                        ).fetchone()
+                        if row is None:
+                            break
+                        self._db.execute(
+                            "UPDATE answers SET last_used = ? WHERE id = ?", [time.time(), self._ids[pos]]
+                        )
+                        self._data_version = self._version()  # our own write needs no reload
+                        self.hits += 1
+                        return row[0]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        question: str,
+        embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        answer: str,
+        namespace: str,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM answers WHERE created <= ?", [now - self.ttl_s])
+            self._db.execute(
+                """
+                INSERT INTO answers (namespace, question, embedding, chunk_ids, answer, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    namespace,
+                    question,
+                    _unit(embedding).tobytes(),
+                    json.dumps(sorted(chunk_ids)),
+                    answer,
+                    now,
+                    now,
+                ],
+            )
+            self._db.execute(
+                """
+                DELETE FROM answers WHERE id IN (
+                    SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                [max(1, self.max_entries)],
+            )
+            self._db.execute("COMMIT")
+            self._data_version = None
+
+    def invalidate(self) -> None:
+        """Drop every entry; call after the corpus changes."""
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._data_version = None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def _refresh(self) -> None:
+        version = self._version()
+        if version == self._data_version:
+            return
+        rows = self._db.execute("SELECT id, namespace, chunk_ids, created, embedding FROM answers").fetchall()
+        self._ids = [row[0] for row in rows]
+        self._keys = [(row[1], row[2]) for row in rows]
+        self._created = np.array([row[3] for row in rows], dtype=np.float64)
+        self._matrix = (
+            np.stack([np.frombuffer(row[4], dtype=np.float32) for row in rows])
+            if rows
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        self._data_version = version
+
+    def _version(self) -> Tuple[int, int]:
+        # data_version moves when other connections commit; total_changes tracks our own.
+        return self._db.execute("PRAGMA data_version").fetchone()[0], self._db.total_changes
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+_CACHES: Dict[str, AnswerCache] = {}
+
+
+def get_answer_cache(settings: Settings) -> Optional[AnswerCache]:
+    """Return the process-wide answer cache for this project, or None if disabled."""
+    if settings.answer_cache_path is None or settings.answer_cache_max_entries <= 0:
+        return None
+    key = str(settings.answer_cache_path)
+    if key not in _CACHES:
+        _CACHES[key] = AnswerCache(
+            settings.answer_cache_path,
+            threshold=settings.answer_cache_threshold,
+            max_entries=settings.answer_cache_max_entries,
+            ttl_s=settings.answer_cache_ttl_s,
+        )
+    cache = _CACHES[key]
+    cache.threshold = settings.answer_cache_threshold
+    cache.max_entries = settings.answer_cache_max_entries
+    cache.ttl_s = settings.answer_cache_ttl_s
+    return cache
@@ -0,0 +1,118 @@
+"""
+Extractive context compression between retrieve() and the prompt.
+
+A 400-word chunk usually holds one or two sentences that answer the question.
+With `compress_contexts` on, each retrieved chunk is split into sentences, the
+sentences are scored by cosine similarity to the query embedding, and the best ones
+are kept (in their original order) up to `compress_chunk_tokens` estimated tokens
+per chunk; the single best sentence is always kept. There is no extra chat call:
+sentence embeddings come from one batched embed_texts() request, and ingest embeds
+every chunk's sentences up front so at query time they are served from the on-disk
+embedding cache.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from src.config import Settings
+from src.embeddings import embed_texts
+from src.retrieval import RetrievedChunk
+from src.tokens import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence-ending punctuation followed by a capitalized word."""
+    return [sentence for sentence in (part.strip() for part in _SENTENCE_END.split(text)) if sentence]
+
+
+def chunk_sentences(contents: Iterable[str]) -> List[str]:
+    """Every sentence of the given chunks that compression may need to embed."""
+    return [sentence for content in contents for sentence in split_sentences(content)]
+
+
+@dataclass
+class CompressionStats:
+    chunks: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Input tokens per output token (3.0 means a third of the text was kept)."""
+        return self.input_tokens / self.output_tokens if self.output_tokens else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.chunks} chunks, {self.input_tokens} -> {self.output_tokens} estimated tokens "
+            f"({self.ratio:.1f}x)"
+        )
+
+
+_TOTALS = CompressionStats()
+_TOTALS_LOCK = threading.Lock()
+
+
+def compress_contexts(
+    settings: Settings, query_embedding: Sequence[float], contents: Sequence[str]
+) -> List[str]:
+    """Each chunk cut down to its sentences most similar to the query, within the token budget."""
+    sentences = [split_sentences(content) for content in contents]
+    flat = [sentence for group in sentences for sentence in group]
+    if not flat:
+        return list(contents)
+    matrix = np.asarray(embed_texts(settings, flat), dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+    compressed: List[str] = []
+    offset = 0
+    for content, group in zip(contents, sentences):
+        group_scores = scores[offset : offset + len(group)]
+        offset += len(group)
+        compressed.append(_top_sentences(group, group_scores, settings.compress_chunk_tokens) or content)
+
+    stats = CompressionStats(
+        chunks=len(contents),
+        input_tokens=sum(estimate_tokens(content) for content in contents),
+        output_tokens=sum(estimate_tokens(text) for text in compressed),
+    )
+    with _TOTALS_LOCK:
+        _TOTALS.chunks += stats.chunks
+        _TOTALS.input_tokens += stats.input_tokens
+        _TOTALS.output_tokens += stats.output_tokens
+    return compressed
+
+
+def context_texts(
+    settings: Settings, query_embedding: Sequence[float], chunks: Sequence[RetrievedChunk]
+) -> List[str]:
+    """Chunk contents for the prompt, compressed when settings.compress_contexts is on."""
+    contents = [chunk.content for chunk in chunks]
+    if not settings.compress_contexts or not contents:
+        return contents
+    return compress_contexts(settings, query_embedding, contents)
+
+
+def compression_stats() -> CompressionStats:
+    """Totals over every compress_contexts() call in this process."""
+    with _TOTALS_LOCK:
+        return CompressionStats(_TOTALS.chunks, _TOTALS.input_tokens, _TOTALS.output_tokens)
+
+
+def _top_sentences(sentences: List[str], scores: np.ndarray, budget: int) -> str:
+    keep: List[int] = []
+    used = 0
+    for pos in np.argsort(-scores, kind="stable"):
+        tokens = estimate_tokens(sentences[pos])
+        if keep and used + tokens > budget:
+            continue
+        keep.append(int(pos))
+        used += tokens
+    return " ".join(sentences[pos] for pos in sorted(keep))
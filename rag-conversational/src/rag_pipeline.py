@@ -1,62 +1,153 @@
 from textwrap import dedent
-from typing import List, Optional
+from typing import Iterator, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
-
-from src import db
+from src.answer_cache import get_answer_cache
+from src.clients import get_openai_client
+from src.compression import context_texts
 from src.config import Settings, load_settings
-from src.data_loader import load_documents
-from src.embeddings import embed_text
 from src.conversation import ConversationHistory
+from src.filters import SearchFilter
+from src.ingest import IngestStats, ingest_corpus
+from src.prompt_packer import pack_prompt
+from src.query_cache import embed_queries, embed_query
+from src.response_cache import stream_chat_completion
+from src.retrieval import RetrievedChunk, candidate_pool, select_chunks
+from src.vector_store import get_vector_store
+
+SYSTEM_PROMPT = (
+    "You are a travel assistant. Use the provided context and recent conversation "
+    "to answer. If context is insufficient, say so."
+)
 
 
 class RAGPipeline:
     def __init__(self, settings: Settings, history: Optional[ConversationHistory] = None):
         self.settings = settings
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.store = get_vector_store(settings)
+        self.answers = get_answer_cache(settings)
+        self.client = get_openai_client(settings)
         self.history = history or ConversationHistory(max_turns=settings.history_size)
 
-    def ingest(self) -> None:
-        documents = load_documents(
-            self.settings.data_dir,
-            chunk_size=self.settings.chunk_size,
-            overlap=self.settings.chunk_overlap,
+    def close(self) -> None:
+        """Release what this pipeline holds; the shared database pool stays open for other users."""
+        self.store.close()
+
+    def ingest(self, full: bool = False) -> IngestStats:
+        stats = ingest_corpus(self.settings, full=full, store=self.store)
+        if self.answers is not None and (stats.embedded or stats.deleted):
+            self.answers.invalidate()  # cached answers were grounded in the old corpus
+        return stats
+
+    def retrieve(
+        self,
+        question: str,
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[RetrievedChunk]:
+        _, chunks = self._search(question, k, probes=probes, ef_search=ef_search, filters=filters)
+        return chunks
+
+    def retrieve_many(
+        self,
+        questions: Sequence[str],
+        k: int = 3,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        retrieve() for a batch of questions: one embeddings request for the uncached
+        questions and one store query, returning up to k chunks per question.
+        """
+        embeddings = embed_queries(self.settings, questions)
+        pool = candidate_pool(self.settings, k)
+        results = self.store.fetch_similar_many(
+            embeddings,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_texts=questions,
+            filters=filters,
+            with_embeddings=pool > k,
+        )
+        return [
+            select_chunks(self.settings, embedding, rows, k) for embedding, rows in zip(embeddings, results)
+        ]
+
+    def _search(
+        self,
+        question: str,
+        k: int,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> Tuple[List[float], List[RetrievedChunk]]:
+        """Query embedding plus the selected chunks for the question."""
+        query_embedding = embed_query(self.settings, question)
+        pool = candidate_pool(self.settings, k)
+        rows = self.store.fetch_similar(
+            query_embedding,
+            limit=pool,
+            probes=probes,
+            ef_search=ef_search,
+            query_text=question,
+            filters=filters,
+            with_embeddings=pool > k,
         )
-        db.ensure_schema(self.settings)
-        payload = []
-        for title, content in documents:
-            embedding = embed_text(self.settings, content)
-            payload.append((title, content, embedding))
-        db.upsert_documents(self.settings, payload)
-
-    def retrieve(self, question: str, k: int = 3) -> List[str]:
-        query_embedding = embed_text(self.settings, question)
-        rows = db.fetch_similar(self.settings, query_embedding, limit=k)
-        return [content for _, content, _ in rows]
+        chunks = select_chunks(self.settings, query_embedding, rows, k)
+        return query_embedding, chunks
 
     def answer(self, question: str, k: int = 3) -> str:
-        contexts = self.retrieve(question, k=k)
-        prompt = self._build_prompt(question, contexts)
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a travel assistant. Use the provided context and recent conversation "
-                    "to answer. If context is insufficient, say so."
-                ),
-            }
-        ]
-        messages.extend(self.history.to_messages())
+        return "".join(self.answer_stream(question, k=k))
+
+    def answer_stream(self, question: str, k: int = 3) -> Iterator[str]:
+        """
+        answer() as it is generated: yields text pieces (a cached answer arrives
+        whole). The full answer is added to the history once the stream ends.
+        """
+        query_embedding, chunks = self._search(question, k)
+        chunk_ids = [chunk.title for chunk in chunks]
+        # Follow-up turns depend on the conversation, so only opening questions are cached.
+        cache = self.answers if not self.history.to_messages() else None
+        if cache is not None:
+            cached = cache.lookup(query_embedding, chunk_ids, self.settings.chat_model)
+            if cached is not None:
+                self.history.add_turn(question, cached)
+                yield cached
+                return
+        packed = pack_prompt(
+            self.settings,
+            SYSTEM_PROMPT,
+            question,
+            history=self.history.to_messages(),
+            internal=context_texts(self.settings, query_embedding, chunks),
+        )
+        prompt = self._build_prompt(question, packed.internal)
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages.extend(packed.history)
         messages.append({"role": "user", "content": prompt})
 
-        response = self.client.chat.completions.create(
+        parts: List[str] = []
+        for piece in self._stream_chat(messages):
+            parts.append(piece)
+            yield piece
+        answer = "".join(parts)
+        if cache is not None and answer:
+            cache.store(question, query_embedding, chunk_ids, answer, self.settings.chat_model)
+        self.history.add_turn(question, answer)
+
+    def _stream_chat(self, messages: List[dict]) -> Iterator[str]:
+        """Chat completion text pieces as they arrive (whole, from the response cache on a repeat)."""
+        return stream_chat_completion(
+            self.settings,
+            self.client,
+            "answer",
             model=self.settings.chat_model,
             temperature=0,
             messages=messages,
         )
-        answer = response.choices[0].message.content
-        self.history.add_turn(question, answer)
-        return answer
 
     @staticmethod
     def _build_prompt(question: str, contexts: List[str]) -> str:
@@ -0,0 +1 @@
+# Makes `src` importable when pytest runs from this project directory.
@@ -0,0 +1,85 @@
+"""
+Process-wide OpenAI clients.
+
+Constructing OpenAI() per call gives every request a fresh HTTP connection pool, so
+each one pays TCP + TLS setup again. get_openai_client() instead returns one client
+per API key and client settings, backed by a keep-alive httpx pool
+(`openai_max_connections`) with explicit timeouts and SDK retries. The pipelines,
+the grader, the router, the tool helpers and the embeddings scheduler all share it.
+"""
+
+import atexit
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import OpenAI
+
+from src.config import Settings
+
+KEEPALIVE_EXPIRY_S = 60.0  # idle connections are kept warm between questions
+
+_ClientKey = Tuple[str, int, float, float]
+_HTTP_CLIENTS: Dict[_ClientKey, httpx.Client] = {}
+_CLIENTS: Dict[Tuple[_ClientKey, int], OpenAI] = {}
+_LOCK = threading.Lock()
+
+
+def _key(settings: Settings) -> _ClientKey:
+    return (
+        settings.openai_api_key,
+        settings.openai_max_connections,
+        settings.openai_timeout_s,
+        settings.openai_connect_timeout_s,
+    )
+
+
+def _timeout(settings: Settings) -> httpx.Timeout:
+    return httpx.Timeout(settings.openai_timeout_s, connect=settings.openai_connect_timeout_s)
+
+
+def get_http_client(settings: Settings) -> httpx.Client:
+    """The shared keep-alive httpx client behind every OpenAI client for these settings."""
+    key = _key(settings)
+    with _LOCK:
+        client = _HTTP_CLIENTS.get(key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY_S,
+            )
+            client = httpx.Client(limits=limits, timeout=_timeout(settings))
+            _HTTP_CLIENTS[key] = client
+        return client
+
+
+def get_openai_client(settings: Settings, max_retries: Optional[int] = None) -> OpenAI:
+    """
+    The process-wide OpenAI client for these settings. max_retries overrides
+    settings.openai_max_retries (the embeddings scheduler retries on its own).
+    """
+    retries = settings.openai_max_retries if max_retries is None else max_retries
+    http_client = get_http_client(settings)
+    key = (_key(settings), retries)
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=settings.openai_api_key,
+                timeout=_timeout(settings),
+                max_retries=retries,
+                http_client=http_client,
+            )
+            _CLIENTS[key] = client
+        return client
+
+
+@atexit.register
+def close_clients() -> None:
+    """Close the shared connection pools; registered to run at interpreter exit."""
+    with _LOCK:
+        for client in _HTTP_CLIENTS.values():
+            client.close()
+        _HTTP_CLIENTS.clear()
+        _CLIENTS.clear()
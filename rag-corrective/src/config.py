@@ -1,13 +1,23 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ENV = BASE_DIR / ".env"
 ROOT_ENV = BASE_DIR.parent / ".env"
+# Embedding cache shared by every project in the workspace (same corpus, same model).
+SHARED_CACHE_DIR = BASE_DIR.parent / ".cache"
+# Seconds a cached chat completion stays valid, per call kind (see src/response_cache.py).
+RESPONSE_CACHE_TTLS: Dict[str, float] = {
+    "route": 7 * 24 * 3600.0,  # adaptive router labels
+    "grade": 24 * 3600.0,  # CRAG document grades
+    "tool": 7 * 24 * 3600.0,  # external tool routing and location extraction
+    "location": 30 * 24 * 3600.0,  # location normalization
+    "answer": 3600.0,  # final answers (prompts may carry live data)
+}
 
 for env_file in (PROJECT_ENV, ROOT_ENV):
     if env_file.exists():
@@ -21,12 +31,64 @@ class Settings:
     embed_model: str = "text-embedding-3-small"
     chat_model: str = "gpt-4o-mini"
     grader_model: str = "gpt-4o-mini"  # lightweight grader
+    speculative_search: str = "weak"  # off | weak | always: run external search alongside grading
+    speculative_distance: float = 0.5  # "weak": speculate when the best chunk is farther than this
     table_name: str = "travel_docs"
     embed_dim: int = 1536
+    vector_backend: str = "pgvector"  # pgvector | numpy (exact, small corpora) | hnsw (in-process ANN)
+    vector_store_dir: Path = BASE_DIR / ".vector_store"  # on-disk files for in-process backends
+    distance_metric: str = "cosine"  # cosine | l2 | inner_product (index opclass + query operator)
+    index_type: str = "hnsw"  # hnsw | ivfflat; built after loading (ivfflat lists sized from row count)
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40  # query-time recall knob for hnsw
+    hnsw_rebuild_fraction: float = 0.1  # in-process graph: rebuild once this share of rows changed in place
+    ivfflat_probes: int = 10  # query-time recall knob for ivfflat
+    partial_index_regions: Tuple[str, ...] = ()  # partial ANN index per region for filtered queries
+    retrieval_mode: str = "hybrid"  # vector | hybrid (keyword + vector rankings fused with RRF)
+    rrf_k: int = 60  # RRF damping constant: score = sum(1 / (rrf_k + rank))
+    hybrid_candidates: int = 20  # candidates taken from each ranking before fusion
+    text_search_config: str = "english"  # Postgres text search configuration for search_tsv
+    mmr_lambda: float = 0.7  # MMR re-ranking: 1.0 = pure relevance (off), lower = more diverse chunks
+    mmr_candidates: int = 12  # rows fetched per query for MMR to pick top-k from
+    retrieval_max_distance: Optional[float] = None  # drop chunks farther than this; None = no ceiling
+    retrieval_distance_margin: Optional[float] = 0.2  # drop chunks this much farther than the best (cosine units)
+    retrieval_token_budget: Optional[int] = 2000  # estimated context tokens per retrieve(); first chunk always kept
+    prompt_token_budget: int = 6000  # counted tokens per chat prompt (system, history, contexts, question)
+    prompt_min_context_tokens: int = 64  # truncate a context only if at least this many tokens fit
+    compress_contexts: bool = False  # keep only each chunk's sentences closest to the question
+    compress_chunk_tokens: int = 100  # estimated tokens kept per compressed chunk
+    db_pool_min: int = 1  # connections opened up front by the process-wide pool
+    db_pool_max: int = 10  # connections open at once, busy or idle
+    db_pool_health_check_s: float = 30.0  # ping pooled connections idle longer than this
+    openai_max_connections: int = 20  # keep-alive HTTP connections shared by every OpenAI call
+    openai_timeout_s: float = 60.0  # read timeout per OpenAI request
+    openai_connect_timeout_s: float = 5.0
+    openai_max_retries: int = 2  # SDK retries for chat calls (embeddings retry in the scheduler)
     data_dir: Path = BASE_DIR / "data"
     history_size: int = 5
     chunk_size: int = 400  # approximate words per chunk
     chunk_overlap: int = 80  # overlapping words between chunks
+    ingest_batch_size: int = 256  # chunks per embed/upsert batch while streaming ingest
+    copy_batch_size: int = 5000  # rows per COPY + merge transaction in upsert_documents
+    embed_batch_size: int = 512  # max inputs per embeddings request (API limit 2048)
+    embed_batch_tokens: int = 100_000  # estimated token budget per embeddings request
+    embed_cache_dir: Optional[Path] = SHARED_CACHE_DIR / "embeddings"  # None disables the cache
+    embed_cache_max_mb: int = 512  # LRU-evicted beyond this size
+    embed_max_concurrency: int = 4  # embeddings requests in flight during ingest
+    embed_rpm: int = 3000  # requests-per-minute quota for the embeddings endpoint
+    embed_tpm: int = 1_000_000  # tokens-per-minute quota for the embeddings endpoint
+    embed_max_retries: int = 6  # retries on 429/transient errors, with jittered backoff
+    query_cache_size: int = 1024  # query embeddings kept in memory by retrieve(); 0 disables
+    query_cache_ttl_s: float = 3600.0  # seconds before a cached query embedding is re-fetched
+    query_cache_disk: bool = True  # back the in-memory tier with the shared embedding cache
+    answer_cache_path: Optional[Path] = BASE_DIR / ".cache" / "answers.sqlite"  # None disables
+    answer_cache_threshold: float = 0.95  # min cosine similarity between questions for a hit
+    answer_cache_max_entries: int = 2000  # LRU-evicted beyond this
+    answer_cache_ttl_s: float = 7 * 24 * 3600.0  # cached answers expire after a week
+    response_cache_path: Optional[Path] = SHARED_CACHE_DIR / "responses.sqlite"  # None disables
+    response_cache_max_mb: int = 64  # stored completion text, LRU-evicted beyond this
+    response_cache_ttl_s: Dict[str, float] = field(default_factory=lambda: dict(RESPONSE_CACHE_TTLS))
 
 
 def load_settings(
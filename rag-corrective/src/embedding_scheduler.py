@@ -0,0 +1,113 @@
+"""
+Concurrent, rate-limited execution of embeddings requests.
+
+A bounded thread pool keeps up to `embed_max_concurrency` requests in flight while
+two token buckets hold the process to the account's requests-per-minute and
+tokens-per-minute quotas. 429s and transient server/connection errors are retried
+with exponential backoff and full jitter (honouring Retry-After when present).
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from src.clients import get_openai_client
+from src.config import Settings
+from src.tokens import estimate_tokens
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Block until `amount` tokens are available, then take them."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingScheduler:
+    """Runs embeddings batches concurrently within the configured rate limits."""
+
+    def __init__(self, settings: Settings):
+        self.model = settings.embed_model
+        self.max_in_flight = max(1, settings.embed_max_concurrency)
+        self.max_retries = settings.embed_max_retries
+        # Retries are handled here so backoff also respects the shared buckets.
+        self.client = get_openai_client(settings, max_retries=0)
+        self.requests = TokenBucket(settings.embed_rpm)
+        self.tokens = TokenBucket(settings.embed_tpm)
+
+    def run(self, batches: Sequence[Sequence[str]]) -> List[List[List[float]]]:
+        """Embed each batch and return the per-batch results in input order."""
+        if len(batches) <= 1 or self.max_in_flight == 1:
+            return [self._embed_batch(batch) for batch in batches]
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+            return list(pool.map(self._embed_batch, batches))
+
+    def _embed_batch(self, batch: Sequence[str]) -> List[List[float]]:
+        cost = sum(estimate_tokens(text) for text in batch)
+        attempt = 0
+        while True:
+            self.requests.acquire(1)
+            self.tokens.acquire(cost)
+            try:
+                response = self.client.embeddings.create(input=list(batch), model=self.model)
+            except RETRYABLE_ERRORS as err:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(_backoff_delay(attempt, err))
+                attempt += 1
+                continue
+            ordered = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in ordered]
+
+
+def _backoff_delay(attempt: int, err: Exception, base: float = 0.5, cap: float = 30.0) -> float:
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    retry_after = _retry_after(err)
+    return max(delay, retry_after) if retry_after is not None else delay
+
+
+def _retry_after(err: Exception) -> Optional[float]:
+    response = getattr(err, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_SCHEDULERS: Dict[Tuple[str, str], EmbeddingScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(settings: Settings) -> EmbeddingScheduler:
+    """Return the process-wide scheduler so every caller shares one set of quotas."""
+    key = (settings.openai_api_key, settings.embed_model)
+    with _SCHEDULERS_LOCK:
+        if key not in _SCHEDULERS:
+            _SCHEDULERS[key] = EmbeddingScheduler(settings)
+        return _SCHEDULERS[key]
@@ -0,0 +1,500 @@
+"""
+Hierarchical Navigable Small World (HNSW) graph over a float32 matrix, in NumPy.
+
+The graph stores only links; vectors stay in the caller's (n, dim) matrix, so the
+index can sit on top of a memory-mapped embeddings file. Layer 0 links are a dense
+(n, 2*m) int32 array padded with -1; the sparse upper layers are kept per node.
+Distances to a node's whole neighbour list are computed in one vectorized step.
+
+Rows can be overwritten (relink) or dropped (compact) in place. Either way every node
+that linked to the changed row re-selects its links from its two-hop neighbourhood,
+and `edits` counts such changes so the caller can rebuild once they add up.
+
+On disk (one directory): links0.npy and levels.npy (memory-mapped on load),
+upper.npy with one [node, level, links...] row per upper-layer node, and hnsw.json.
+
+For the cosine metric rows and queries must be L2-normalized.
+
+Run `python -m src.hnsw` from a project directory to compare recall and latency
+against exact search, on synthetic data or on a saved embeddings matrix.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Candidate = Tuple[float, int]  # (distance, node)
+
+METRICS = ("cosine", "l2", "inner_product")
+
+
+class HNSWIndex:
+    """Approximate nearest-neighbour graph with incremental insert."""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        metric: str = "cosine",
+        m: int = 16,
+        ef_construction: int = 64,
+        seed: int = 0,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of: {', '.join(METRICS)}")
+        self.vectors = vectors
+        self.metric = metric
+        self.m = max(2, m)
+        self.m0 = 2 * self.m
+        self.ef_construction = max(ef_construction, self.m)
+        self.seed = seed
+        self.count = 0
+        self.entry = -1
+        self.max_level = -1
+        self.edits = 0  # rows relinked or dropped in place since the graph was built
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.links0 = np.full((0, self.m0), -1, dtype=np.int32)
+        self.upper: List[Dict[int, np.ndarray]] = []
+        self._level_mult = 1.0 / math.log(self.m)
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def extend(self, vectors: Optional[np.ndarray] = None) -> int:
+        """
+        Insert every row of `vectors` (default: the current matrix) not yet in the graph.
+        The first len(self) rows must be the ones already indexed. Returns rows added.
+        """
+        if vectors is not None:
+            self.vectors = vectors
+        total = len(self.vectors)
+        added = total - self.count
+        if added <= 0:
+            return 0
+        self._reserve(total)
+        for node in range(self.count, total):
+            level = min(int(-math.log(1.0 - self._rng.random()) * self._level_mult), 127)
+            self.levels[node] = level
+            for _ in range(len(self.upper), level):
+                self.upper.append({})
+            for layer in range(1, level + 1):
+                self.upper[layer - 1][node] = np.full(self.m, -1, dtype=np.int32)
+            self.count = node + 1
+            if self.entry < 0:
+                self.entry, self.max_level = node, level
+                continue
+            self._link(node, level)
+            if level > self.max_level:
+                self.entry, self.max_level = node, level
+        return added
+
+    def relink(self, node: int) -> None:
+        """Re-select a node's links, and those of nodes linking to it, after its vector changed."""
+        if self.count <= 1:
+            return
+        self._reserve(self.count)  # a loaded graph is a read-only memory map
+        level = int(self.levels[node])
+        linking = [self._linking_to(node, layer) for layer in range(level + 1)]
+        self._link(node, level)
+        for layer, others in enumerate(linking):
+            for other in others:
+                self._repair(other, layer, self._two_hop(other, layer, self._neighbours))
+        self.edits += 1
+
+    def compact(self, keep: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Drop indexed rows where `keep` is False and renumber the rest to match a
+        compacted `vectors` matrix. Nodes that linked to a dropped row re-select their
+        links from their two-hop neighbourhood (through the dropped row too), and nodes
+        that search can no longer reach from the entry point are linked in again.
+        """
+        keep = np.asarray(keep, dtype=bool)[: self.count]
+        if keep.all():
+            self.vectors = vectors
+            return
+        remap = np.full(self.count + 1, -1, dtype=np.int32)  # last slot maps the -1 padding
+        remap[: self.count][keep] = np.arange(int(keep.sum()), dtype=np.int32)
+
+        old_links0 = np.asarray(self.links0[: self.count])
+        old_upper = self.upper
+
+        def old_neighbours(node: int, layer: int) -> np.ndarray:
+            links = old_links0[node] if layer == 0 else old_upper[layer - 1][node]
+            return links[links >= 0]
+
+        # Candidates are gathered in old ids, so paths through dropped rows still count.
+        dropped = np.append(~keep, False)  # last slot: the -1 padding
+        repairs: List[Tuple[int, int, np.ndarray]] = []
+        for layer in range(len(old_upper) + 1):
+            if layer == 0:
+                damaged = np.flatnonzero(keep & dropped[old_links0].any(axis=1)).tolist()
+            else:
+                nodes = old_upper[layer - 1]
+                damaged = [node for node, links in nodes.items() if keep[node] and dropped[links].any()]
+            for node in damaged:
+                candidates = remap[self._two_hop(node, layer, old_neighbours)]
+                repairs.append((layer, int(remap[node]), candidates[candidates >= 0]))
+
+        self.links0 = _pack_rows(remap[old_links0[keep]])
+        upper: List[Dict[int, np.ndarray]] = []
+        for layer in old_upper:
+            kept = {node: links for node, links in layer.items() if keep[node]}
+            upper.append({int(remap[node]): _pack_rows(remap[links][None, :])[0] for node, links in kept.items()})
+        while upper and not upper[-1]:
+            upper.pop()
+        self.upper = upper
+
+        self.levels = np.asarray(self.levels[: self.count])[keep].copy()
+        self.count = int(keep.sum())
+        self.vectors = vectors
+        if self.count == 0:
+            self.entry, self.max_level = -1, -1
+            return
+        if remap[self.entry] < 0:
+            self.entry = int(np.argmax(self.levels))
+        else:
+            self.entry = int(remap[self.entry])
+        self.max_level = int(self.levels[self.entry])
+        for layer, node, candidates in repairs:
+            self._repair(node, layer, candidates)
+        self._reconnect()
+        self.edits += len(keep) - self.count
+
+    def search(self, query: Sequence[float], k: int, ef: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, distances) of the approximate k nearest indexed rows, closest first."""
+        if self.count == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        ef = max(ef or self.ef_construction, k)
+        nearest = [(float(self._distances(query, [self.entry])[0]), self.entry)]
+        for layer in range(self.max_level, 0, -1):
+            nearest = self._search_layer(query, nearest, 1, layer)
+        found = self._search_layer(query, nearest, ef, 0)[:k]
+        ids = np.array([node for _, node in found], dtype=np.int64)
+        distances = np.array([dist for dist, _ in found], dtype=np.float32)
+        if self.metric == "l2":
+            distances = np.sqrt(np.maximum(distances, 0.0))
+        return ids, distances
+
+    def save(self, directory: Path) -> None:
+        """Write the graph atomically file-by-file; hnsw.json is written last."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        upper_rows = [
+            [node, layer + 1, *links.tolist()]
+            for layer, nodes in enumerate(self.upper)
+            for node, links in sorted(nodes.items())
+        ]
+        arrays = {
+            "links0": np.ascontiguousarray(self.links0[: self.count], dtype=np.int32),
+            "levels": np.ascontiguousarray(self.levels[: self.count], dtype=np.int8),
+            "upper": np.array(upper_rows, dtype=np.int32).reshape(-1, 2 + self.m),
+        }
+        for name, array in arrays.items():
+            tmp = directory / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, directory / f"{name}.npy")
+        meta = {
+            "metric": self.metric,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "seed": self.seed,
+            "count": self.count,
+            "entry": self.entry,
+            "max_level": self.max_level,
+            "edits": self.edits,
+        }
+        tmp = directory / "hnsw.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, directory / "hnsw.json")
+
+    @classmethod
+    def load(cls, directory: Path, vectors: np.ndarray) -> Optional["HNSWIndex"]:
+        """Memory-map a saved graph over `vectors`; None if missing or inconsistent."""
+        directory = Path(directory)
+        meta_path = directory / "hnsw.json"
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        index = cls(
+            vectors,
+            metric=meta["metric"],
+            m=meta["m"],
+            ef_construction=meta["ef_construction"],
+            seed=meta["seed"],
+        )
+        try:
+            links0 = np.load(directory / "links0.npy", mmap_mode="r")
+            levels = np.load(directory / "levels.npy")
+            upper = np.load(directory / "upper.npy")
+        except (OSError, ValueError):
+            return None
+        count = meta["count"]
+        if len(links0) != count or len(levels) != count or count > len(vectors):
+            return None
+        index.links0, index.levels, index.count = links0, levels, count
+        index.entry, index.max_level = meta["entry"], meta["max_level"]
+        index.edits = meta.get("edits", 0)
+        index.upper = [{} for _ in range(max(0, index.max_level))]
+        for row in upper:
+            index.upper[int(row[1]) - 1][int(row[0])] = row[2:].copy()
+        # Resume the level sequence rather than replaying the seed from the start.
+        index._rng = random.Random(f"{index.seed}:{count}")
+        return index
+
+    def _link(self, node: int, level: int) -> None:
+        query = np.asarray(self.vectors[node], dtype=np.float32)
+        nearest = [(float(self._distances(query, [self.entry])[0]), self.entry)]
+        for layer in range(self.max_level, level, -1):
+            nearest = self._search_layer(query, nearest, 1, layer)
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(query, nearest, self.ef_construction + 1, layer)
+            found = [(dist, other) for dist, other in found if other != node]
+            if not found:
+                continue
+            neighbours = self._select(found, self.m)
+            self._set_links(node, layer, neighbours)
+            width = self.m0 if layer == 0 else self.m
+            for other in neighbours:
+                self._connect(other, node, layer, width)
+            nearest = found
+
+    def _connect(self, node: int, new: int, layer: int, width: int) -> None:
+        links = self._neighbours(node, layer)
+        if new in links:
+            return
+        if len(links) < width:
+            self._set_links(node, layer, [*links.tolist(), new])
+            return
+        self._reselect(node, layer, np.append(links, new))
+
+    def _reselect(self, node: int, layer: int, candidates: np.ndarray) -> None:
+        """Replace a node's links with the heuristic's pick of the closest candidates."""
+        candidates = np.unique(candidates[candidates != node])
+        if not len(candidates):
+            return
+        distances = self._distances(np.asarray(self.vectors[node], dtype=np.float32), candidates)
+        order = np.argsort(distances)[: max(self.ef_construction, self.m0 + 1)]
+        ranked = [(float(distances[i]), int(candidates[i])) for i in order]
+        self._set_links(node, layer, self._select(ranked, self.m0 if layer == 0 else self.m))
+
+    def _repair(self, node: int, layer: int, candidates: np.ndarray) -> None:
+        """Re-select a node's links from `candidates` and link them back, as an insert would."""
+        self._reselect(node, layer, candidates)
+        width = self.m0 if layer == 0 else self.m
+        for other in self._neighbours(node, layer).tolist():
+            self._connect(other, node, layer, width)
+
+    @staticmethod
+    def _two_hop(node: int, layer: int, neighbours: Callable[[int, int], np.ndarray]) -> np.ndarray:
+        first = neighbours(node, layer)
+        return np.concatenate([first, *(neighbours(int(other), layer) for other in first)])
+
+    def _linking_to(self, node: int, layer: int) -> List[int]:
+        if layer == 0:
+            return np.flatnonzero((self.links0[: self.count] == node).any(axis=1)).tolist()
+        return [other for other, links in self.upper[layer - 1].items() if node in links]
+
+    def _reconnect(self) -> None:
+        """Link in every node that a layer-0 walk from the entry point cannot reach."""
+        links0 = self.links0[: self.count]
+        reached = np.zeros(self.count, dtype=bool)
+        frontier = np.array([self.entry])
+        reached[frontier] = True
+        while len(frontier):
+            found = np.unique(links0[frontier])
+            found = found[found >= 0]
+            frontier = found[~reached[found]]
+            reached[frontier] = True
+        for node in np.flatnonzero(~reached).tolist():
+            self._link(node, int(self.levels[node]))
+
+    def _select(self, candidates: List[Candidate], m: int) -> List[int]:
+        """Neighbour heuristic: keep a candidate only if no kept one is closer to it."""
+        if len(candidates) <= 1:
+            return [node for _, node in candidates]
+        nodes = [node for _, node in candidates]
+        pairwise = self._pairwise(nodes)
+        kept: List[int] = []
+        for pos, (dist, _) in enumerate(candidates):
+            if len(kept) >= m:
+                break
+            if not kept or not (pairwise[pos, kept] < dist).any():
+                kept.append(pos)
+        return [nodes[pos] for pos in kept]
+
+    def _search_layer(
+        self, query: np.ndarray, entry: List[Candidate], ef: int, layer: int
+    ) -> List[Candidate]:
+        visited = {node for _, node in entry}
+        candidates = list(entry)
+        heapq.heapify(candidates)
+        results = [(-dist, node) for dist, node in entry]
+        heapq.heapify(results)
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -results[0][0] and len(results) >= ef:
+                break
+            fresh = [other for other in self._neighbours(node, layer).tolist() if other not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            bound = -results[0][0]
+            for other_dist, other in zip(self._distances(query, fresh).tolist(), fresh):
+                if len(results) < ef or other_dist < bound:
+                    heapq.heappush(candidates, (other_dist, other))
+                    heapq.heappush(results, (-other_dist, other))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+                    bound = -results[0][0]
+        return sorted((-dist, node) for dist, node in results)
+
+    def _distances(self, query: np.ndarray, nodes: Sequence[int]) -> np.ndarray:
+        rows = self.vectors[np.asarray(nodes, dtype=np.int64)]
+        if self.metric == "cosine":
+            return 1.0 - rows @ query
+        if self.metric == "inner_product":
+            return -(rows @ query)
+        diff = rows - query
+        return np.einsum("ij,ij->i", diff, diff)  # squared: same order, sqrt only on output
+
+    def _pairwise(self, nodes: Sequence[int]) -> np.ndarray:
+        rows = np.asarray(self.vectors[np.asarray(nodes, dtype=np.int64)], dtype=np.float32)
+        products = rows @ rows.T
+        if self.metric == "cosine":
+            return 1.0 - products
+        if self.metric == "inner_product":
+            return -products
+        sq = np.einsum("ij,ij->i", rows, rows)
+        return sq[:, None] + sq[None, :] - 2.0 * products
+
+    def _neighbours(self, node: int, layer: int) -> np.ndarray:
+        links = self.links0[node] if layer == 0 else self.upper[layer - 1][node]
+        return links[links >= 0]
+
+    def _set_links(self, node: int, layer: int, links: List[int]) -> None:
+        width = self.m0 if layer == 0 else self.m
+        row = np.full(width, -1, dtype=np.int32)
+        row[: len(links)] = links
+        if layer == 0:
+            self.links0[node] = row
+        else:
+            self.upper[layer - 1][node] = row
+
+    def _reserve(self, rows: int) -> None:
+        """Grow link/level storage (and leave read-only memory maps) before inserting."""
+        capacity = len(self.links0)
+        if capacity >= rows and self.links0.flags.writeable and self.levels.flags.writeable:
+            return
+        capacity = max(rows, 2 * capacity, 1024)
+        links0 = np.full((capacity, self.m0), -1, dtype=np.int32)
+        links0[: self.count] = self.links0[: self.count]
+        levels = np.zeros(capacity, dtype=np.int8)
+        levels[: self.count] = self.levels[: self.count]
+        self.links0, self.levels = links0, levels
+
+
+def _pack_rows(links: np.ndarray) -> np.ndarray:
+    """Move -1 padding to the end of each row, keeping link order."""
+    order = np.argsort(links < 0, axis=1, kind="stable")
+    return np.take_along_axis(links, order, axis=1).astype(np.int32)
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int, metric: str) -> np.ndarray:
+    """Brute-force top-k ids, the ground truth for recall."""
+    if metric == "cosine":
+        distances = 1.0 - vectors @ query
+    elif metric == "inner_product":
+        distances = -(vectors @ query)
+    else:
+        distances = np.einsum("ij,ij->i", vectors, vectors) - 2.0 * (vectors @ query)
+    top = np.argpartition(distances, min(k, len(vectors)) - 1)[:k]
+    return top[np.argsort(distances[top])]
+
+
+def evaluate_recall(
+    index: HNSWIndex, queries: np.ndarray, k: int, ef_values: Sequence[int]
+) -> List[Dict[str, float]]:
+    """Recall@k and mean latency per ef, against exact search on the same vectors."""
+    vectors = np.asarray(index.vectors[: len(index)])
+    started = time.perf_counter()
+    truth = [set(exact_search(vectors, q, k, index.metric).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    report = []
+    for ef in ef_values:
+        hits = 0
+        started = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            ids, _ = index.search(query, k, ef=ef)
+            hits += len(expected.intersection(ids.tolist()))
+        approx_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        report.append(
+            {"ef": ef, "recall": hits / (k * len(queries)), "hnsw_ms": approx_ms, "exact_ms": exact_ms}
+        )
+    return report
+
+
+def _synthetic(rows: int, dim: int, seed: int) -> np.ndarray:
+    """Clustered Gaussian data, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, rows // 100), dim)).astype(np.float32)
+    assignments = rng.integers(0, len(centers), size=rows)
+    return centers[assignments] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare HNSW recall/latency with exact search.")
+    parser.add_argument("--vectors", type=Path, help="Saved .npy matrix (default: synthetic data).")
+    parser.add_argument("--rows", type=int, default=10_000, help="Synthetic rows.")
+    parser.add_argument("--dim", type=int, default=128, help="Synthetic dimensions.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", choices=METRICS, default="cosine")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--ef", default="10,20,40,80,160", help="Comma-separated ef_search values.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.asarray(np.load(args.vectors, mmap_mode="r"), dtype=np.float32)
+    else:
+        vectors = _synthetic(args.rows + args.queries, args.dim, args.seed)
+    if args.metric == "cosine":
+        vectors = _normalize(vectors)
+    rng = np.random.default_rng(args.seed + 1)
+    if args.vectors:
+        picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+        queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+        data = vectors
+    else:
+        data, queries = vectors[: args.rows], vectors[args.rows :]
+    if args.metric == "cosine":
+        queries = _normalize(queries)
+
+    index = HNSWIndex(data, metric=args.metric, m=args.m, ef_construction=args.ef_construction, seed=args.seed)
+    started = time.perf_counter()
+    index.extend()
+    build_s = time.perf_counter() - started
+    print(f"{len(data)} rows x {data.shape[1]} dims, metric={args.metric}, m={args.m}, "
+          f"ef_construction={args.ef_construction}: built in {build_s:.1f}s")
+    print(f"{'ef':>6} {'recall@' + str(args.k):>10} {'hnsw ms':>9} {'exact ms':>9}")
+    for row in evaluate_recall(index, queries, args.k, [int(v) for v in args.ef.split(",")]):
+        print(f"{row['ef']:>6} {row['recall']:>10.3f} {row['hnsw_ms']:>9.2f} {row['exact_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
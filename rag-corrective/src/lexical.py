@@ -0,0 +1,102 @@
+"""
+Keyword side of hybrid retrieval: an in-process BM25 index and reciprocal rank fusion.
+
+The pgvector backend ranks keywords in SQL (a generated tsvector column with a GIN
+index, see src/db.py); the in-process backends use BM25Index over the same
+title + content text. Either way the lexical and vector rankings are fused with
+RRF, which needs only ranks, so BM25 scores and vector distances never have to be
+put on a common scale.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by can do does for from how i if in into is it its me my
+    of on or our should so than that the their them then there these they this to up
+    us was we what when where which who why will with you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plural endings folded."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents, addressed by position.
+
+    Per-posting weights are precomputed at build time, so a query is one
+    vectorized add per query term plus a top-k partition.
+    """
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.size = len(documents)
+        counts = [Counter(tokenize(doc)) for doc in documents]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+        norms = k1 * (1.0 - b + b * lengths / avg_length)
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc_id, counter in enumerate(counts):
+            for term, tf in counter.items():
+                ids, tfs = postings.setdefault(term, ([], []))
+                ids.append(doc_id)
+                tfs.append(tf)
+
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, (ids, tfs) in postings.items():
+            doc_ids = np.array(ids, dtype=np.int64)
+            tf = np.array(tfs, dtype=np.float32)
+            idf = math.log(1.0 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            self._postings[term] = (doc_ids, idf * tf * (k1 + 1.0) / (tf + norms[doc_ids]))
+
+    def search(self, query: str, limit: int, allowed: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Positions of the best-scoring documents that contain at least one query term,
+        optionally only among the positions in `allowed`.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            hit = self._postings.get(term)
+            if hit is not None:
+                scores[hit[0]] += hit[1]
+        if allowed is not None:
+            kept = np.zeros_like(scores)
+            kept[allowed] = scores[allowed]
+            scores = kept
+        matched = np.flatnonzero(scores)
+        if limit <= 0 or not len(matched):
+            return []
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        return matched[np.argsort(-scores[matched], kind="stable")].tolist()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Hashable]:
+    """
+    Merge ranked lists by score(d) = sum over lists of 1 / (k + rank of d), rank from 1.
+    Ties keep the order in which items were first seen.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
@@ -0,0 +1,149 @@
+"""
+Query-embedding cache for retrieve().
+
+Questions are normalized (Unicode NFKC, case-folded, whitespace collapsed, trailing
+punctuation dropped) so trivially different phrasings of the same query share one
+embedding. Lookups go through an in-process LRU with a TTL, then optionally the
+shared on-disk embedding cache, and only then the embeddings API. The normalized
+form is only a cache key: what gets embedded (and stored on disk) is the original
+text of the first phrasing seen.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.config import Settings
+from src.embedding_cache import get_embedding_cache
+from src.embeddings import embed_texts
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!. ")
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} memory hits, {self.disk_hits} disk hits, {self.misses} embedded via API "
+            f"({self.hit_rate:.0%} hit rate, {self.size} cached)"
+        )
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU + TTL map from (model, normalized query) to its embedding."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = QueryCacheStats()
+
+    def embed(self, settings: Settings, text: str) -> List[float]:
+        return self.embed_many(settings, [text])[0]
+
+    def embed_many(self, settings: Settings, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings in input order; misses are resolved together."""
+        queries = [normalize_query(text) or text for text in texts]
+        originals: Dict[str, str] = {}
+        for query, text in zip(queries, texts):
+            originals.setdefault(query, text)
+        results: List[Optional[List[float]]] = [None] * len(queries)
+        now = time.monotonic()
+        with self._lock:
+            for pos, query in enumerate(queries):
+                key = (settings.embed_model, query)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats.hits += 1
+                    results[pos] = entry[1]
+        missing = {q: originals[q] for q, vec in zip(queries, results) if vec is None}
+        vectors = self._fetch(settings, missing, now) if missing else {}
+        return [vec if vec is not None else vectors[query] for query, vec in zip(queries, results)]
+
+    def _fetch(self, settings: Settings, missing: Dict[str, str], now: float) -> Dict[str, List[float]]:
+        """Resolve cache misses (normalized query -> original text) from disk, then the API."""
+        queries = list(missing)
+        disk = get_embedding_cache(settings) if settings.query_cache_disk else None
+        found = disk.get_many([missing[q] for q in queries]) if disk is not None else [None] * len(queries)
+        vectors = {query: vec for query, vec in zip(queries, found) if vec is not None}
+        needed = [query for query in queries if query not in vectors]
+        if needed:
+            texts = [missing[query] for query in needed]
+            fresh = embed_texts(settings, texts, use_cache=False)
+            if disk is not None:
+                disk.put_many(texts, fresh)
+            vectors.update(zip(needed, fresh))
+
+        with self._lock:
+            self._stats.disk_hits += len(queries) - len(needed)
+            self._stats.misses += len(needed)
+            for query in queries:
+                key = (settings.embed_model, query)
+                self._entries[key] = (now + self.ttl_s, vectors[query])
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vectors
+
+    def stats(self) -> QueryCacheStats:
+        with self._lock:
+            return QueryCacheStats(
+                hits=self._stats.hits,
+                disk_hits=self._stats.disk_hits,
+                misses=self._stats.misses,
+                size=len(self._entries),
+            )
+
+
+_CACHE: Optional[QueryEmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_query_cache(settings: Settings) -> QueryEmbeddingCache:
+    """Return the process-wide query cache, resized to the current settings."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = QueryEmbeddingCache(settings.query_cache_size, settings.query_cache_ttl_s)
+        _CACHE.max_entries = settings.query_cache_size
+        _CACHE.ttl_s = settings.query_cache_ttl_s
+        return _CACHE
+
+
+def embed_query(settings: Settings, text: str) -> List[float]:
+    """Embedding for a search query, served from cache when possible."""
+    if settings.query_cache_size <= 0:
+        return embed_texts(settings, [text])[0]
+    return get_query_cache(settings).embed(settings, text)
+
+
+def embed_queries(settings: Settings, texts: Sequence[str]) -> List[List[float]]:
+    """embed_query for a batch: cached ones are served locally, the rest in one request."""
+    if settings.query_cache_size <= 0:
+        return embed_texts(settings, texts)
+    return get_query_cache(settings).embed_many(settings, texts)
+
+
+def query_cache_stats() -> QueryCacheStats:
+    return _CACHE.stats() if _CACHE is not None else QueryCacheStats()
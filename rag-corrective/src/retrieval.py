@@ -0,0 +1,167 @@
+"""
+Post-retrieval selection for retrieve(): distance cutoffs, MMR and a token budget.
+
+A top-k request returns between 0 and k chunks. Candidates farther than
+`retrieval_max_distance`, or more than `retrieval_distance_margin` behind the best
+candidate, are dropped first, so an easy question whose best chunk is a clear match
+gets a short prompt. The margin is in cosine-distance units whatever the
+`distance_metric`: for the unit-length embeddings the API returns, inner-product
+distance is cosine distance minus one and squared L2 distance is twice it.
+
+Chunks overlap by `chunk_overlap` words, so the nearest neighbours of a question are
+often consecutive chunks of one file saying the same thing. Maximal marginal
+relevance fetches `mmr_candidates` rows with their embeddings and greedily picks k
+that are relevant to the question but unlike the chunks already picked:
+
+    score(d) = mmr_lambda * sim(q, d) - (1 - mmr_lambda) * max(sim(d, s) for picked s)
+
+In hybrid mode rows arrive in fused (RRF) order, and that order is the relevance:
+sim(q, d) is replaced by a score falling linearly from 1.0 for the fused leader, so
+an exact keyword hit keeps its place. Keyword hits are also exempt from the distance
+cutoffs, since their vector distance is large by definition.
+
+Picked chunks are then kept in order while their estimated tokens fit
+`retrieval_token_budget` (the first chunk is always kept).
+"""
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.config import Settings
+from src.tokens import estimate_tokens
+from src.vector_store import Match
+
+
+@dataclass(frozen=True)
+class RetrievedChunk:
+    title: str
+    content: str
+    distance: float
+    token_count: int  # estimated, see src/tokens.py
+
+
+def candidate_pool(settings: Settings, k: int) -> int:
+    """Rows to fetch for a top-k request: the MMR pool, or just k when MMR is off."""
+    if settings.mmr_lambda >= 1.0:
+        return k
+    return max(k, settings.mmr_candidates)
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float,
+    relevance: Optional[np.ndarray] = None,
+) -> List[int]:
+    """
+    Indices of k rows of `embeddings` in MMR pick order. Relevance is cosine
+    similarity to the query unless given per row (e.g. from a fused ranking).
+    """
+    matrix = _unit_rows(np.asarray(embeddings, dtype=np.float32))
+    count = min(k, len(matrix))
+    if count <= 0:
+        return []
+    if relevance is None:
+        query = _unit_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+        relevance = matrix @ query
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = matrix @ matrix.T
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    while len(picked) < count:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def select_diverse(
+    settings: Settings, query_embedding: Sequence[float], rows: Sequence[tuple], k: int
+) -> List[Match]:
+    """
+    Pick k of the fetched rows with MMR and drop their embeddings. Rows fetched
+    without embeddings (MMR off, or no more candidates than k) are only truncated.
+    """
+    if len(rows) <= k or len(rows[0]) < 4:
+        return [(title, content, distance) for title, content, distance, *_ in rows[:k]]
+    relevance = fused_relevance(len(rows)) if settings.retrieval_mode == "hybrid" else None
+    picked = maximal_marginal_relevance(
+        query_embedding, np.stack([row[3] for row in rows]), k, settings.mmr_lambda, relevance
+    )
+    return [tuple(rows[pos][:3]) for pos in picked]
+
+
+def fused_relevance(count: int) -> np.ndarray:
+    """Relevance by position in a fused ranking: 1.0 for the leader, falling linearly."""
+    return 1.0 - np.arange(count, dtype=np.float32) / max(count, 1)
+
+
+def keyword_promoted(rows: Sequence[tuple]) -> List[bool]:
+    """
+    Per row of a fused (RRF) ranking, whether fusion placed it ahead of its position
+    by vector distance. A vector-only hit never moves up, since every row closer to
+    the query also outranks it, so a promoted row got there through its keyword match.
+    """
+    by_distance = sorted(range(len(rows)), key=lambda pos: rows[pos][2])
+    distance_rank = {pos: rank for rank, pos in enumerate(by_distance)}
+    return [pos < distance_rank[pos] for pos in range(len(rows))]
+
+
+def within_distance(settings: Settings, rows: Sequence[tuple]) -> List[tuple]:
+    """
+    Rows that pass the absolute and relative (to the closest row) distance cutoffs.
+    In hybrid mode, rows promoted by their keyword match are kept regardless.
+    """
+    if not rows:
+        return []
+    limit = float("inf")
+    if settings.retrieval_max_distance is not None:
+        limit = settings.retrieval_max_distance
+    if settings.retrieval_distance_margin is not None:
+        best = min(row[2] for row in rows)
+        limit = min(limit, margin_limit(settings.distance_metric, best, settings.retrieval_distance_margin))
+    if settings.retrieval_mode == "hybrid":
+        exempt = keyword_promoted(rows)
+    else:
+        exempt = [False] * len(rows)
+    return [row for row, keep in zip(rows, exempt) if keep or row[2] <= limit]
+
+
+def margin_limit(metric: str, best: float, margin: float) -> float:
+    """Farthest distance under `metric` within `margin` cosine distance of `best`."""
+    if metric == "l2":
+        return math.sqrt(best * best + 2.0 * margin)  # |a - b|^2 = 2 * cosine distance
+    return best + margin  # inner_product differs from cosine distance by a constant
+
+
+def within_budget(settings: Settings, rows: Sequence[Match]) -> List[RetrievedChunk]:
+    """Leading rows whose estimated tokens fit retrieval_token_budget, as RetrievedChunks."""
+    chunks: List[RetrievedChunk] = []
+    used = 0
+    budget = settings.retrieval_token_budget
+    for title, content, distance in rows:
+        tokens = estimate_tokens(content)
+        if chunks and budget is not None and used + tokens > budget:
+            break
+        chunks.append(RetrievedChunk(title, content, float(distance), tokens))
+        used += tokens
+    return chunks
+
+
+def select_chunks(
+    settings: Settings, query_embedding: Sequence[float], rows: Sequence[tuple], k: int
+) -> List[RetrievedChunk]:
+    """Up to k chunks from fetched candidates: distance cutoffs, then MMR, then the token budget."""
+    diverse = select_diverse(settings, query_embedding, within_distance(settings, rows), k)
+    return within_budget(settings, diverse)
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
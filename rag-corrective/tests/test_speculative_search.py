@@ -0,0 +1,53 @@
+"""Speculative external search is stopped once the gate grades the documents "correct"."""
+
+import threading
+
+import numpy as np
+
+from src import external_search, rag_pipeline
+from src.config import Settings
+from src.retrieval import RetrievedChunk
+
+QUESTION = "Plan a trip to Lisbon"
+
+
+def test_correct_grade_makes_no_tool_http_calls(monkeypatch, tmp_path):
+    started, answering = threading.Event(), threading.Event()
+    http_calls = []
+
+    def extract_locations(query, settings, max_locations=3):
+        started.set()  # the search is running, so Future.cancel() alone cannot stop it
+        assert answering.wait(5)
+        return ["Lisbon"]
+
+    def grade(settings, question, contexts):
+        assert started.wait(5)
+        return "correct"
+
+    def stream_chat(messages):
+        answering.set()
+        yield "From the guide."
+
+    monkeypatch.setattr(external_search, "llm_extract_locations", extract_locations)
+    monkeypatch.setattr(external_search, "llm_correct_location", lambda loc, settings: loc)
+    monkeypatch.setattr(external_search._HTTP, "get", lambda *args, **kwargs: http_calls.append(args))
+    monkeypatch.setattr(rag_pipeline, "grade_documents", grade)
+
+    settings = Settings(
+        openai_api_key="test",
+        database_url="postgresql://unused",
+        speculative_search="always",
+        answer_cache_path=None,
+        response_cache_path=None,
+        embed_cache_dir=None,
+        vector_backend="numpy",
+        vector_store_dir=tmp_path,
+    )
+    pipeline = rag_pipeline.RAGPipeline(settings)
+    chunk = RetrievedChunk(title="lisbon", content="Lisbon guide.", distance=0.1, token_count=3)
+    monkeypatch.setattr(pipeline, "_search", lambda question, k: (np.ones(4), [chunk]))
+    monkeypatch.setattr(pipeline, "_stream_chat", stream_chat)
+
+    assert pipeline.answer(QUESTION) == "From the guide."
+    pipeline._speculation.shutdown(wait=True)
+    assert http_calls == []
@@ -0,0 +1,62 @@
+"""Memoized tool calls are shared across threads that run in the answer's context."""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.tool_memo import memoize_tool, tool_memo_scope
+
+
+def test_concurrent_calls_run_the_tool_once():
+    calls = []
+    barrier = threading.Barrier(4)
+
+    @memoize_tool("slow_lookup")
+    def slow_lookup(city):
+        calls.append(city)
+        time.sleep(0.05)
+        return [f"forecast for {city}"]
+
+    def lookup(city):
+        barrier.wait()
+        return slow_lookup(city)
+
+    with tool_memo_scope(), ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, lookup, city)
+            for city in ("Lisbon", " lisbon", "LISBON", "Lisbon ")
+        ]
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert results == [[f"forecast for {calls[0]}"]] * 4
+
+
+def test_failed_call_is_retried_by_a_waiting_thread():
+    attempts = []
+    started = threading.Event()
+
+    @memoize_tool("flaky_lookup")
+    def flaky_lookup(city):
+        attempts.append(city)
+        if len(attempts) == 1:
+            started.set()
+            time.sleep(0.05)
+            raise RuntimeError("timeout")
+        return "sunny"
+
+    def first():
+        try:
+            flaky_lookup("Porto")
+        except RuntimeError:
+            return "failed"
+
+    def second():
+        started.wait(5)
+        return flaky_lookup("Porto")
+
+    with tool_memo_scope(), ThreadPoolExecutor(max_workers=2) as pool:
+        runs = [pool.submit(contextvars.copy_context().run, fn) for fn in (first, second)]
+        assert [run.result() for run in runs] == ["failed", "sunny"]
+    assert len(attempts) == 2